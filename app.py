@@ -1,57 +1,297 @@
 from flask import Flask, render_template, request, redirect, url_for
-from tensorflow.keras.models import load_model
-from flask import jsonify
+from flask import jsonify, Response
 
 import numpy as np
-from PIL import Image
+import functools
+import io
 import os
+import threading
+import time
+
+from batching import MicroBatcher
+from inference_backends import load_backend, resolve_model_path
+from metrics import Counter, Gauge, Histogram, MetricsRegistry
+from prediction_cache import PredictionCache, make_cache_key, model_fingerprint
+from preprocessing import IMAGE_DECODE_ERRORS, IMG_HEIGHT, IMG_WIDTH, preprocess_batch, preprocess_into
+from upload_archive import UploadArchiver
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
+# Dynamic micro-batching for /predict (see batching.py)
+app.config['MAX_BATCH'] = int(os.environ.get('MAX_BATCH', 16))
+app.config['MAX_WAIT_MS'] = float(os.environ.get('MAX_WAIT_MS', 5))
+# Largest upload series /predict_batch accepts in one request
+app.config['MAX_BATCH_FILES'] = int(os.environ.get('MAX_BATCH_FILES', 32))
+# Content-hash cache of predictions (see prediction_cache.py)
+app.config['CACHE_MAX_ENTRIES'] = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+app.config['CACHE_TTL_SECONDS'] = float(os.environ.get('CACHE_TTL_SECONDS', 3600))
+
+# Uploads are decoded in memory; keeping a copy on disk is optional and
+# happens on a background thread with a retention policy
+app.config['ARCHIVE_UPLOADS'] = os.environ.get('ARCHIVE_UPLOADS', '1') == '1'
+app.config['ARCHIVE_MAX_FILES'] = int(os.environ.get('ARCHIVE_MAX_FILES', 1000))
+app.config['ARCHIVE_MAX_AGE_HOURS'] = float(os.environ.get('ARCHIVE_MAX_AGE_HOURS', 24 * 7))
+# Uploads waiting for the disk at most; more are not archived
+app.config['ARCHIVE_MAX_PENDING'] = int(os.environ.get('ARCHIVE_MAX_PENDING', 64))
+# Batch sizes run through the model right after it is loaded, before /ready
+# reports ready
+app.config['WARMUP_BATCH_SIZES'] = [int(b) for b in os.environ.get('WARMUP_BATCH_SIZES', '1').split(',') if b]
+# 'keras', 'tflite' or 'onnxruntime' (see inference_backends.py / convert_model.py);
+# 'random' is an untrained stand-in for benchmarks/load_test_fibrosis.py
+app.config['INFERENCE_BACKEND'] = os.environ.get('INFERENCE_BACKEND', 'keras')
+
+archiver = None
+if app.config['ARCHIVE_UPLOADS']:
+    archiver = UploadArchiver(app.config['UPLOAD_FOLDER'],
+                              max_files=app.config['ARCHIVE_MAX_FILES'],
+                              max_age_seconds=app.config['ARCHIVE_MAX_AGE_HOURS'] * 3600,
+                              max_pending=app.config['ARCHIVE_MAX_PENDING'])
+
+
+# The trained model; the backend (and TensorFlow, if used) is only imported when first needed
+MODEL_PATH = 'Dense_model.h5'
+model = None
+model_id = app.config['INFERENCE_BACKEND'] + ':' + model_fingerprint(
+    resolve_model_path(MODEL_PATH, app.config['INFERENCE_BACKEND']))
+_model_lock = threading.Lock()
+_ready = threading.Event()
+_warm_up_lock = threading.Lock()
+_warm_up_pid = None
+
+
+def get_model():
+    """
+    Load the model on first use, run the warm-up batches through it so graph
+    tracing happens before real traffic, and mark the app ready. Nothing here
+    runs at import time: with gunicorn's preload_app the import happens in the
+    master, and TensorFlow's runtime does not survive a fork.
+    """
+    global model
+    if model is None:
+        with _model_lock:
+            if model is None:
+                loaded = load_backend(app.config['INFERENCE_BACKEND'], MODEL_PATH)
+                for batch_size in app.config['WARMUP_BATCH_SIZES']:
+                    loaded.predict(np.zeros((batch_size, IMG_HEIGHT, IMG_WIDTH, 3), dtype=np.float32))
+                model = loaded
+                _ready.set()
+    return model
+
+
+def warm_up():
+    global _warm_up_pid
+    try:
+        get_model()
+    except Exception:
+        app.logger.exception('Loading the model failed')
+        # The next /ready poll tries again
+        _warm_up_pid = None
+
+
+def start_warm_up():
+    """Load the model on a background thread, once per process (see gunicorn.conf.py and /ready)."""
+    global _warm_up_pid
+    with _warm_up_lock:
+        if _ready.is_set() or _warm_up_pid == os.getpid():
+            return
+        _warm_up_pid = os.getpid()
+    threading.Thread(target=warm_up, name='model-warm-up', daemon=True).start()
+
+# Prometheus-style metrics, scraped from /metrics (per process; see metrics.py)
+metrics_registry = MetricsRegistry()
+STAGE_SECONDS = Histogram('fibrosis_stage_seconds',
+                          'Time per request stage: read, archive_enqueue, decode, model, response',
+                          ['endpoint', 'stage'], registry=metrics_registry)
+REQUEST_SECONDS = Histogram('fibrosis_request_seconds', 'End-to-end request handling time',
+                            ['endpoint'], registry=metrics_registry)
+REQUESTS_IN_FLIGHT = Gauge('fibrosis_requests_in_flight', 'Requests being handled', ['endpoint'],
+                           registry=metrics_registry)
+REQUEST_ERRORS = Counter('fibrosis_request_errors_total', 'Failed requests by error type',
+                         ['endpoint', 'error'], registry=metrics_registry)
+PREDICTIONS = Counter('fibrosis_predictions_total', 'Predictions by class label', ['label'],
+                      registry=metrics_registry)
+CACHE_LOOKUPS = Counter('fibrosis_prediction_cache_lookups_total', 'Prediction cache lookups', ['result'],
+                        registry=metrics_registry)
+MODEL_FORWARD_SECONDS = Histogram('fibrosis_model_forward_seconds', 'Time of one model.predict call',
+                                  registry=metrics_registry)
+MODEL_BATCH_SIZE = Histogram('fibrosis_model_batch_size', 'Images per model.predict call',
+                             registry=metrics_registry, buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+MODEL_IN_FLIGHT = Gauge('fibrosis_model_calls_in_flight', 'model.predict calls running', registry=metrics_registry)
+
+
+def model_forward(batch):
+    """get_model().predict(batch), recording batch size and forward time."""
+    MODEL_BATCH_SIZE.observe(len(batch))
+    with MODEL_IN_FLIGHT.track_inprogress(), MODEL_FORWARD_SECONDS.time():
+        return get_model().predict(batch)
+
+
+def instrumented(view):
+    """Track in-flight count, duration and raised exceptions of a route."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        endpoint = view.__name__
+        start = time.perf_counter()
+        try:
+            with REQUESTS_IN_FLIGHT.labels(endpoint).track_inprogress():
+                return view(*args, **kwargs)
+        except Exception as e:
+            REQUEST_ERRORS.labels(endpoint, type(e).__name__).inc()
+            raise
+        finally:
+            REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+    return wrapper
+
 
-# Create upload folder if it doesn't exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+def bad_request(error, message, status=400):
+    REQUEST_ERRORS.labels(request.endpoint, error).inc()
+    return jsonify({'error': message}), status
 
 
-# Load the trained model
-model = load_model('Dense_model.h5')
+prediction_cache = PredictionCache(max_entries=app.config['CACHE_MAX_ENTRIES'],
+                                   ttl_seconds=app.config['CACHE_TTL_SECONDS'])
 
-# Define target image size
-IMG_WIDTH = 224
-IMG_HEIGHT = 224
+# Concurrent /predict requests share one model.predict call
+batcher = MicroBatcher(model_forward,
+                       max_batch=app.config['MAX_BATCH'],
+                       max_wait_ms=app.config['MAX_WAIT_MS'])
+
+# Image size and normalization live in preprocessing.py
 CLASS_NAMES = ['F0', 'F1', 'F2', 'F3', 'F4']
 
-def preprocess_image(image_path):
-    img = Image.open(image_path).convert('RGB')
-    img = img.resize((IMG_WIDTH, IMG_HEIGHT))
-    img_array = np.array(img).astype('float32') / 255.0
-    img_array = np.expand_dims(img_array, axis=0)
-    return img_array
+# Each request thread decodes into its own float32 input buffer, grown to the
+# largest series it has seen (at most MAX_BATCH_FILES rows) and reused
+_input_buffers = threading.local()
+
+def input_buffer(rows):
+    buffer = getattr(_input_buffers, 'array', None)
+    if buffer is None or len(buffer) < rows:
+        buffer = _input_buffers.array = np.empty((rows, IMG_HEIGHT, IMG_WIDTH, 3), dtype=np.float32)
+    return buffer
+
+def format_prediction(prediction_probs):
+    prediction_index = np.argmax(prediction_probs)
+    PREDICTIONS.labels(CLASS_NAMES[prediction_index]).inc()
+    return {
+        'prediction': CLASS_NAMES[prediction_index],
+        'confidence': float(prediction_probs[prediction_index])
+    }
+
+def read_upload(file):
+    """
+    Read an uploaded file from the request stream and look it up in the prediction cache.
+    When archiving is on the bytes are also handed to the background archiver.
+
+    Returns:
+        tuple: (data, cache_key, cached prediction or None)
+    """
+    with STAGE_SECONDS.labels(request.endpoint, 'read').time():
+        data = file.read()
+    if archiver is not None:
+        # Only the hand-off to the archiver; the disk write happens on its thread
+        with STAGE_SECONDS.labels(request.endpoint, 'archive_enqueue').time():
+            archiver.archive(file.filename, data)
+    cache_key = make_cache_key(data, model_id)
+    cached = prediction_cache.get(cache_key)
+    CACHE_LOOKUPS.labels('miss' if cached is None else 'hit').inc()
+    return data, cache_key, cached
 
 @app.route('/', methods=['GET', 'POST'])
 
 @app.route('/predict', methods=['POST'])
+@instrumented
 def predict():
     if 'image' not in request.files:
-        return jsonify({'error': 'No image provided'}), 400
+        return bad_request('no_image', 'No image provided')
 
     file = request.files['image']
     if file.filename == '':
-        return jsonify({'error': 'Empty filename'}), 400
+        return bad_request('empty_filename', 'Empty filename')
 
-    filename = file.filename
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
+    data, cache_key, prediction_probs = read_upload(file)
+    if prediction_probs is None:
+        # Cache miss: decode in memory and go through the model
+        try:
+            with STAGE_SECONDS.labels('predict', 'decode').time():
+                # The batcher copies the row into its batch before this thread reuses the buffer
+                img_array = preprocess_batch([io.BytesIO(data)], out=input_buffer(1))
+        except IMAGE_DECODE_ERRORS:
+            return bad_request('unreadable_image', 'Image could not be decoded')
+        with STAGE_SECONDS.labels('predict', 'model').time():
+            prediction_probs = batcher.predict(img_array)
+        prediction_cache.put(cache_key, prediction_probs)
 
-    img_array = preprocess_image(filepath)
-    prediction_probs = model.predict(img_array)[0]
-    prediction_index = np.argmax(prediction_probs)
-    prediction_label = CLASS_NAMES[prediction_index]
+    with STAGE_SECONDS.labels('predict', 'response').time():
+        return jsonify(format_prediction(prediction_probs))
 
-    return jsonify({
-        'prediction': prediction_label,
-        'confidence': float(prediction_probs[prediction_index])
-    })
+@app.route('/predict_batch', methods=['POST'])
+@instrumented
+def predict_batch():
+    # Accepts several files under the same 'images' field and runs them
+    # through the model in a single forward pass
+    files = [f for f in request.files.getlist('images') if f.filename != '']
+    if not files:
+        return bad_request('no_image', 'No images provided')
+    if len(files) > app.config['MAX_BATCH_FILES']:
+        return bad_request('too_many_images', f"At most {app.config['MAX_BATCH_FILES']} images per request", 413)
+
+    uploads = [read_upload(file) for file in files]
+
+    # Only the cache misses go through the model, still as a single
+    # (N, 224, 224, 3) model.predict call for the whole series. A file that
+    # cannot be decoded gets an error entry instead of failing the series.
+    misses = [i for i, (_, _, cached) in enumerate(uploads) if cached is None]
+    all_probs = [cached for _, _, cached in uploads]
+    decode_errors = {}
+    if misses:
+        with STAGE_SECONDS.labels('predict_batch', 'decode').time():
+            batch = input_buffer(len(misses))
+            decoded = []
+            for i in misses:
+                try:
+                    preprocess_into(io.BytesIO(uploads[i][0]), batch[len(decoded)])
+                except IMAGE_DECODE_ERRORS:
+                    decode_errors[i] = 'Image could not be decoded'
+                    REQUEST_ERRORS.labels('predict_batch', 'unreadable_image').inc()
+                    continue
+                decoded.append(i)
+        if decoded:
+            with STAGE_SECONDS.labels('predict_batch', 'model').time():
+                all_outputs = model_forward(batch[:len(decoded)])
+            for i, prediction_probs in zip(decoded, all_outputs):
+                prediction_cache.put(uploads[i][1], prediction_probs)
+                all_probs[i] = prediction_probs
+
+    with STAGE_SECONDS.labels('predict_batch', 'response').time():
+        results = []
+        for i, (file, prediction_probs) in enumerate(zip(files, all_probs)):
+            if i in decode_errors:
+                result = {'error': decode_errors[i]}
+            else:
+                result = format_prediction(prediction_probs)
+            result['filename'] = file.filename
+            results.append(result)
+
+        return jsonify({'results': results})
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    # Only healthy once this worker has loaded and warmed up the model; the first
+    # poll starts that under WSGI servers that do not call start_warm_up()
+    if not _ready.is_set():
+        start_warm_up()
+        return jsonify({'status': 'warming_up'}), 503
+    return jsonify({'status': 'ready'})
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(prediction_cache.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Prometheus text exposition format
+    return Response(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 if __name__ == '__main__':
+    start_warm_up()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,25 @@
+"""
+The Streamlit apps' secrets file (.streamlit/secrets.toml), read without
+Streamlit by the headless entry points: id_service.py, id_queue_worker.py and
+bulk_ingest.py. The Streamlit apps keep using st.secrets, which reads the same file.
+"""
+import os
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python < 3.11
+    import tomli as tomllib
+
+DEFAULT_SECRETS_PATH = os.path.join('.streamlit', 'secrets.toml')
+
+
+def load_secrets(path=None):
+    """
+    Parse the secrets file into a dict of sections ([api_credentials], [ocr], ...).
+
+    Args:
+        path (str): Defaults to the SECRETS_PATH environment variable, then .streamlit/secrets.toml.
+    """
+    path = path or os.environ.get('SECRETS_PATH', DEFAULT_SECRETS_PATH)
+    with open(path, 'rb') as f:
+        return tomllib.load(f)
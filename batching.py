@@ -0,0 +1,91 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-image predictions into one model call.
+
+    Requests are queued; a worker thread takes up to `max_batch` of them, or
+    whatever arrived within `max_wait_ms` of the first one, stacks them and
+    runs `predict_fn` once. Each caller gets its own row back via a Future.
+
+    Args:
+        predict_fn (callable): Takes an (N, H, W, C) array, returns (N, classes).
+        max_batch (int): Largest batch handed to `predict_fn`.
+        max_wait_ms (float): How long the first request in a batch may wait
+                             for company before the batch is run anyway.
+    """
+
+    def __init__(self, predict_fn, max_batch=16, max_wait_ms=5):
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork, so the worker is started lazily in
+        # whichever process first submits (e.g. each gunicorn worker)
+        if self._worker is not None and self._worker.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive() or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._worker.start()
+
+    def submit(self, img_array):
+        """
+        Queue one preprocessed image, shaped (1, H, W, C) or (H, W, C).
+
+        Returns:
+            Future: Resolves to the model output row for this image.
+        """
+        self._ensure_worker()
+        if img_array.ndim == 3:
+            img_array = np.expand_dims(img_array, axis=0)
+        future = Future()
+        self._queue.put((img_array, future))
+        return future
+
+    def predict(self, img_array, timeout=None):
+        return self.submit(img_array).result(timeout=timeout)
+
+    def _collect(self):
+        # Block for the first request, then gather more until the batch is
+        # full or the wait budget of the first request runs out
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            futures = [future for _, future in items]
+            try:
+                batch = np.concatenate([img_array for img_array, _ in items], axis=0)
+                outputs = self.predict_fn(batch)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for future, output in zip(futures, outputs):
+                future.set_result(output)
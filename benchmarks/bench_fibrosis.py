@@ -0,0 +1,142 @@
+"""
+Micro-benchmarks for the fibrosis prediction service (app.py).
+
+    preprocess   preprocess_image on each test image (decode + resize + scale)
+    predict_bN   backend.predict on a batch of N preprocessed images
+    serialize    format_prediction + jsonify, as /predict builds its response
+
+Images come from --images (a folder) or are generated (random noise JPEGs at
+--size). The default --backend is 'random', a randomly initialized stand-in
+with the real model's shapes, so this runs without Dense_model.h5; pass
+--backend keras/tflite/onnxruntime to measure the real model.
+
+Example:
+    python benchmarks/bench_fibrosis.py --output fibrosis_micro.json
+    python benchmarks/bench_fibrosis.py --backend tflite --batch-sizes 1 8 32 64
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from inference_backends import BACKENDS, load_backend  # noqa: E402
+from latency_stats import percentile  # noqa: E402
+from preprocessing import IMG_HEIGHT, IMG_WIDTH, preprocess_image  # noqa: E402
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def summarize(latencies, items_per_call=1):
+    total = sum(latencies)
+    return {
+        'calls': len(latencies),
+        'throughput_per_s': len(latencies) * items_per_call / total if total else None,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0.0,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def timed(fn, iterations):
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def synthetic_images(count, size, seed=0):
+    """Random noise JPEGs, roughly what a phone photo of a scan costs to decode at this size."""
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        pixels = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format='JPEG', quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def load_images(folder):
+    return [open(os.path.join(folder, name), 'rb').read() for name in sorted(os.listdir(folder))
+            if name.lower().endswith(IMAGE_EXTENSIONS)]
+
+
+def bench_serialize(probs, iterations):
+    """format_prediction + jsonify inside a request context, like /predict."""
+    # app.py reads its configuration at import time
+    os.environ.setdefault('ARCHIVE_UPLOADS', '0')
+    import app as fibrosis_app
+    from flask import jsonify
+
+    with fibrosis_app.app.test_request_context('/predict', method='POST'):
+        return timed(lambda: jsonify(fibrosis_app.format_prediction(probs)).get_data(), iterations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help="Folder of test images (default: generated)")
+    parser.add_argument('--count', type=int, default=32, help="Number of generated images")
+    parser.add_argument('--size', type=int, default=1024, help="Side of the generated images in pixels")
+    parser.add_argument('--backend', default='random', choices=sorted(BACKENDS))
+    parser.add_argument('--model', default=os.path.join(ROOT, 'Dense_model.h5'))
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--no-serialize', action='store_true', help="Skip the jsonify benchmark (needs Flask)")
+    parser.add_argument('--output', help="Write the results as JSON")
+    args = parser.parse_args()
+
+    images = load_images(args.images) if args.images else synthetic_images(args.count, args.size)
+    if not images:
+        parser.error(f"no images in {args.images}")
+
+    stages = {}
+    latencies = []
+    for _ in range(max(args.iterations // len(images), 1)):
+        for img_bytes in images:
+            start = time.perf_counter()
+            preprocess_image(io.BytesIO(img_bytes))
+            latencies.append(time.perf_counter() - start)
+    stages['preprocess'] = summarize(latencies)
+
+    backend = load_backend(args.backend, args.model)
+    for batch_size in args.batch_sizes:
+        batch = np.random.default_rng(batch_size).random((batch_size, IMG_HEIGHT, IMG_WIDTH, 3), dtype=np.float32)
+        backend.predict(batch)  # first call traces / allocates for this shape
+        stages[f'predict_b{batch_size}'] = summarize(timed(lambda: backend.predict(batch), args.iterations),
+                                                     items_per_call=batch_size)
+
+    if not args.no_serialize:
+        probs = backend.predict(np.zeros((1, IMG_HEIGHT, IMG_WIDTH, 3), dtype=np.float32))[0]
+        stages['serialize'] = summarize(bench_serialize(probs, args.iterations * 20))
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'backend': args.backend,
+        'images': len(images),
+        'image_source': args.images or f'generated {args.size}x{args.size} JPEG',
+        'stages': stages,
+    }
+    for stage, stats in stages.items():
+        print(f"{stage:<12} {stats['throughput_per_s'] or 0:>10.1f}/s  p50 {stats['p50_ms']:.3f} ms  "
+              f"p95 {stats['p95_ms']:.3f} ms  p99 {stats['p99_ms']:.3f} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
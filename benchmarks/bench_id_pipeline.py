@@ -0,0 +1,225 @@
+"""
+Benchmark the ID card extraction pipeline on recorded Azure results, offline.
+
+Each fixture in --fixtures is an AnalyzeResult.to_dict() dump (see
+ReplayOcrBackend.record). The stages after OCR are timed separately:
+
+    sort        sort_ocr_lines
+    classify    classify_lines over the sorted line texts
+    extract     process_ocr_lines into a fresh extraction dict
+    birthday    extract_birthday on the extracted id
+    db_write    per card, what id_jobs.insert_card runs: OracleImageStore.put of the
+                fixture image and INSERT_EXTRACTED_ID_BY_HASH_SQL on one session,
+                rolled back (--db only)
+
+For each stage the report has throughput (cards/s) and p50/p95/p99 latency in ms,
+plus per-field accuracy against --truth. With --baseline (a previous --output),
+stages whose p95 got slower by more than --max-regression, or fields whose
+accuracy dropped, are listed and the exit status is 1.
+
+Example:
+    python benchmarks/bench_id_pipeline.py --output id_pipeline.json
+    python benchmarks/bench_id_pipeline.py --baseline id_pipeline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from id_extraction import (EXTRACTED_FIELDS, INSERT_EXTRACTED_ID_BY_HASH_SQL, build_extracted_id_row,  # noqa: E402
+                           classify_lines, extract_birthday, get_mime_type, new_extracted_info,
+                           process_ocr_lines, sort_ocr_lines)
+from latency_stats import percentile  # noqa: E402
+from ocr_backends import FIXTURE_IMAGE_EXTENSIONS, result_from_dict  # noqa: E402
+
+FIXTURES_DIR = os.path.join(ROOT, 'benchmarks', 'fixtures', 'id_cards')
+TRUTH_PATH = os.path.join(ROOT, 'benchmarks', 'fixtures', 'id_cards_truth.json')
+
+
+def load_fixtures(folder):
+    fixtures = {}
+    for name in sorted(os.listdir(folder)):
+        if name.endswith('.json'):
+            with open(os.path.join(folder, name), encoding='utf-8') as f:
+                fixtures[os.path.splitext(name)[0]] = result_from_dict(json.load(f))
+    return fixtures
+
+
+def load_fixture_image(folder, name):
+    """The card image recorded next to a fixture, or b'' when there is none; returns (bytes, mime_type)."""
+    for extension in FIXTURE_IMAGE_EXTENSIONS:
+        path = os.path.join(folder, name + extension)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return f.read(), get_mime_type(path)
+    return b'', 'image/jpeg'
+
+
+def time_stage(fn, inputs, iterations):
+    """Run fn(x) for every input `iterations` times; returns per-call latencies in seconds and the last outputs."""
+    latencies = []
+    outputs = []
+    for _ in range(iterations):
+        outputs = []
+        for value in inputs:
+            start = time.perf_counter()
+            outputs.append(fn(value))
+            latencies.append(time.perf_counter() - start)
+    return latencies, outputs
+
+
+def summarize(latencies):
+    total = sum(latencies)
+    return {
+        'calls': len(latencies),
+        'throughput_per_s': len(latencies) / total if total else None,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def quiet(fn):
+    # extract_birthday / arabic_to_english_numerals print their intermediate values
+    def wrapper(*args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn(*args)
+    return wrapper
+
+
+def time_db_write(cards, card_type, iterations):
+    """
+    Register every (info, img_bytes, mime_type) card the way the app does and roll
+    back after each iteration, so nothing is kept: the image goes through
+    OracleImageStore.put and the row is inserted by hash, on the same session.
+    """
+    import streamlit as st
+    from image_store import OracleImageStore
+    from oracle_pool import create_pool, make_dsn
+
+    credentials = st.secrets["api_credentials"]
+    pool = create_pool(credentials['user'], credentials['pass'], make_dsn(credentials), max_sessions=1)
+    image_store = OracleImageStore(pool)
+    latencies = []
+    with pool.acquire() as connection:
+        cursor = connection.cursor()
+        for _ in range(iterations):
+            for info, img_bytes, mime_type in cards:
+                start = time.perf_counter()
+                img_sha256 = image_store.put(img_bytes, mime_type, connection=connection)
+                row = build_extracted_id_row(info, img_bytes, mime_type, card_type, img_sha256=img_sha256)
+                cursor.execute(INSERT_EXTRACTED_ID_BY_HASH_SQL, row)
+                latencies.append(time.perf_counter() - start)
+            connection.rollback()
+    pool.close()
+    return latencies
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, max_regression):
+    """Regressions of `report` against `baseline`, as printable strings."""
+    regressions = []
+    for stage, stats in report['stages'].items():
+        before = baseline.get('stages', {}).get(stage)
+        if before and before['p95_ms'] and stats['p95_ms'] > before['p95_ms'] * (1 + max_regression):
+            regressions.append(f"{stage}: p95 {before['p95_ms']:.4f} ms -> {stats['p95_ms']:.4f} ms")
+    for field, accuracy in report['field_accuracy'].items():
+        before = baseline.get('field_accuracy', {}).get(field)
+        if before is not None and accuracy is not None and accuracy < before:
+            regressions.append(f"{field}: accuracy {before:.2%} -> {accuracy:.2%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help="Folder of recorded AnalyzeResult JSON files")
+    parser.add_argument('--truth', default=TRUTH_PATH, help="JSON {fixture name: {field: expected value}}")
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--db', action='store_true', help="Also time the Extracted_ID insert (rolled back)")
+    parser.add_argument('--output', help="Write the results as JSON")
+    parser.add_argument('--baseline', help="Previous --output to check for regressions")
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help="Allowed relative p95 slowdown per stage (default 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        parser.error(f"no .json fixtures in {args.fixtures}")
+    names = list(fixtures)
+    results = list(fixtures.values())
+
+    stages = {}
+    latencies, sorted_lines = time_stage(lambda result: sort_ocr_lines(result.pages[0].lines), results,
+                                         args.iterations)
+    stages['sort'] = summarize(latencies)
+
+    texts = [[line.content for line in lines] for lines in sorted_lines]
+    latencies, _ = time_stage(classify_lines, texts, args.iterations)
+    stages['classify'] = summarize(latencies)
+
+    latencies, extracted = time_stage(lambda result: process_ocr_lines(result, new_extracted_info()), results,
+                                      args.iterations)
+    stages['extract'] = summarize(latencies)
+
+    ids = [info['id'] for info in extracted if info['id']]
+    latencies, _ = time_stage(quiet(extract_birthday), ids, args.iterations)
+    stages['birthday'] = summarize(latencies)
+
+    if args.db:
+        cards = [(info,) + load_fixture_image(args.fixtures, name) for name, info in zip(names, extracted)]
+        stages['db_write'] = summarize(quiet(time_db_write)(cards, 'bench', max(args.iterations // 20, 1)))
+
+    field_accuracy = {field: None for field in EXTRACTED_FIELDS}
+    if args.truth and os.path.exists(args.truth):
+        with open(args.truth, encoding='utf-8') as f:
+            truth = json.load(f)
+        compared = [(info, truth[name]) for name, info in zip(names, extracted) if name in truth]
+        for field in EXTRACTED_FIELDS:
+            correct = sum(info[field] == expected.get(field) for info, expected in compared)
+            field_accuracy[field] = correct / len(compared) if compared else None
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'fixtures': len(fixtures),
+        'iterations': args.iterations,
+        'stages': stages,
+        'field_accuracy': field_accuracy,
+    }
+
+    for stage, stats in stages.items():
+        print(f"{stage:<10} {stats['throughput_per_s'] or 0:>12.0f}/s  p50 {stats['p50_ms']:.4f} ms  "
+              f"p95 {stats['p95_ms']:.4f} ms  p99 {stats['p99_ms']:.4f} ms")
+    print('accuracy', json.dumps(field_accuracy))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for regression in regressions:
+            print('REGRESSION', regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
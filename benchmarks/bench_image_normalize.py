@@ -0,0 +1,111 @@
+"""
+Measure what image normalization saves before Azure OCR and Oracle storage.
+
+For every image in a folder and every --max-side setting, reports the size
+reduction and normalization time. With --azure it also analyzes the original and
+the normalized image, and reports Azure latency and how many extracted fields
+are identical to the ones from the original (field agreement).
+
+Example:
+    python benchmarks/bench_image_normalize.py scans/ --max-side 1024 1600 2048
+    python benchmarks/bench_image_normalize.py scans/ --azure --output normalize.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from id_extraction import EXTRACTED_FIELDS, extract_id_fields  # noqa: E402
+from image_normalize import normalize_card_image  # noqa: E402
+from ocr_profiles import ANALYSIS_PROFILES, DEFAULT_PROFILE, get_profile  # noqa: E402
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+
+
+def analyze_timed(client, profile, img_bytes):
+    # Same model and options as the app (see ocr_profiles.py)
+    start = time.perf_counter()
+    result = client.begin_analyze_document(profile.model_id, img_bytes, **profile.analyze_kwargs()).result()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('folder', help="Folder of ID card photos")
+    parser.add_argument('--max-side', type=int, nargs='+', default=[1024, 1600, 2048])
+    parser.add_argument('--format', default='JPEG', choices=['JPEG', 'WEBP'])
+    parser.add_argument('--quality', type=int, default=85)
+    parser.add_argument('--azure', action='store_true', help="Also measure OCR latency and field agreement")
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, choices=sorted(ANALYSIS_PROFILES),
+                        help="Azure analysis profile (see ocr_profiles.py)")
+    parser.add_argument('--output', help="Write the results as JSON")
+    args = parser.parse_args()
+    profile = get_profile(args.profile)
+
+    paths = sorted(
+        os.path.join(args.folder, name) for name in os.listdir(args.folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS))
+    images = {path: open(path, 'rb').read() for path in paths}
+
+    client = None
+    baseline = {}
+    if args.azure:
+        import streamlit as st
+        from azure.ai.formrecognizer import DocumentAnalysisClient
+        from azure.core.credentials import AzureKeyCredential
+
+        credentials = st.secrets["api_credentials"]
+        client = DocumentAnalysisClient(endpoint=credentials["endpoint"],
+                                        credential=AzureKeyCredential(credentials["api_key"]))
+        for path, img_bytes in images.items():
+            result, latency = analyze_timed(client, profile, img_bytes)
+            baseline[path] = (extract_id_fields(result), latency)
+
+    report = {'images': len(images), 'format': args.format, 'quality': args.quality, 'settings': []}
+    if client is not None:
+        report['profile'] = profile.name
+    original_total = sum(len(b) for b in images.values())
+    if baseline:
+        report['original_ocr_latency_s'] = statistics.median(latency for _, latency in baseline.values())
+
+    for max_side in args.max_side:
+        sizes, times, latencies = [], [], []
+        agreeing = compared = 0
+        for path, img_bytes in images.items():
+            start = time.perf_counter()
+            normalized = normalize_card_image(img_bytes, max_side=max_side, image_format=args.format,
+                                              quality=args.quality)
+            times.append(time.perf_counter() - start)
+            sizes.append(len(normalized.data))
+
+            if client is not None:
+                result, latency = analyze_timed(client, profile, normalized.data)
+                latencies.append(latency)
+                record, original = extract_id_fields(result), baseline[path][0]
+                agreeing += sum(getattr(record, f) == getattr(original, f) for f in EXTRACTED_FIELDS)
+                compared += len(EXTRACTED_FIELDS)
+
+        setting = {
+            'max_side': max_side,
+            'bytes_before': original_total,
+            'bytes_after': sum(sizes),
+            'size_reduction': 1 - sum(sizes) / original_total if original_total else 0.0,
+            'normalize_ms_median': statistics.median(times) * 1000 if times else 0.0,
+        }
+        if latencies:
+            setting['ocr_latency_s_median'] = statistics.median(latencies)
+            setting['field_agreement'] = agreeing / compared
+        report['settings'].append(setting)
+        print(json.dumps(setting, ensure_ascii=False))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Compare Azure analysis profiles (see ocr_profiles.py) on real ID card images.
+
+For each profile, reports median/p95 latency of begin_analyze_document + result()
+and per-field accuracy. Accuracy is measured against --truth (a JSON file mapping
+image file name to the expected fields) or, without it, against what the
+'document' profile (the previous default) extracts.
+
+Example:
+    python benchmarks/bench_ocr_profiles.py scans/ --truth truth.json --output profiles.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from id_extraction import EXTRACTED_FIELDS, extract_id_fields  # noqa: E402
+from latency_stats import percentile  # noqa: E402
+from ocr_profiles import ANALYSIS_PROFILES  # noqa: E402
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('folder', help="Folder of ID card images")
+    parser.add_argument('--profiles', nargs='+', default=sorted(ANALYSIS_PROFILES), choices=sorted(ANALYSIS_PROFILES))
+    parser.add_argument('--truth', help="JSON {file name: {field: expected value}}")
+    parser.add_argument('--output', help="Write the results as JSON")
+    args = parser.parse_args()
+
+    import streamlit as st
+    from azure.ai.formrecognizer import DocumentAnalysisClient
+    from azure.core.credentials import AzureKeyCredential
+
+    credentials = st.secrets["api_credentials"]
+    client = DocumentAnalysisClient(endpoint=credentials["endpoint"],
+                                    credential=AzureKeyCredential(credentials["api_key"]))
+
+    names = sorted(name for name in os.listdir(args.folder) if name.lower().endswith(IMAGE_EXTENSIONS))
+    images = {name: open(os.path.join(args.folder, name), 'rb').read() for name in names}
+
+    records = {}
+    latencies = {}
+    for profile_name in args.profiles:
+        profile = ANALYSIS_PROFILES[profile_name]
+        records[profile_name], latencies[profile_name] = {}, []
+        for name, img_bytes in images.items():
+            start = time.perf_counter()
+            result = client.begin_analyze_document(profile.model_id, img_bytes, **profile.analyze_kwargs()).result()
+            latencies[profile_name].append(time.perf_counter() - start)
+            records[profile_name][name] = extract_id_fields(result)._asdict()
+
+    if args.truth:
+        with open(args.truth, encoding='utf-8') as f:
+            truth = json.load(f)
+    else:
+        if 'document' not in records:
+            parser.error("without --truth the 'document' profile is needed as the reference")
+        truth = records['document']
+
+    report = {'images': len(images), 'reference': args.truth or 'document', 'profiles': {}}
+    for profile_name in args.profiles:
+        field_accuracy = {}
+        for field in EXTRACTED_FIELDS:
+            compared = [name for name in names if name in truth]
+            correct = sum(records[profile_name][name][field] == truth[name].get(field) for name in compared)
+            field_accuracy[field] = correct / len(compared) if compared else None
+        report['profiles'][profile_name] = {
+            'model_id': ANALYSIS_PROFILES[profile_name].model_id,
+            'latency_s_p50': statistics.median(latencies[profile_name]) if names else 0.0,
+            'latency_s_p95': percentile(latencies[profile_name], 95),
+            'field_accuracy': field_accuracy,
+        }
+        print(profile_name, json.dumps(report['profiles'][profile_name], ensure_ascii=False))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
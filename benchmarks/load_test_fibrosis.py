@@ -0,0 +1,227 @@
+"""
+Load test for the fibrosis prediction service.
+
+Starts the service (or targets --url) and drives /predict with --concurrency
+clients for --duration seconds, each client on its own keep-alive connection
+posting one image per request. Reports throughput, error counts and p50/p95/p99
+latency; compare runs before and after changing workers, batching or backend.
+
+    --server flask      `python app.py`-style threaded Flask development server
+    --server gunicorn   the render.yaml start command (gunicorn -c gunicorn.conf.py app:app)
+
+The spawned server uses the 'random' stand-in model unless --backend says
+otherwise, with the prediction cache off (CACHE_MAX_ENTRIES=0) and upload
+archiving off, so every request reaches the model. Other settings such as
+MAX_BATCH, MAX_WAIT_MS, WEB_CONCURRENCY or GUNICORN_THREADS are taken from the
+environment or --env.
+
+Example:
+    python benchmarks/load_test_fibrosis.py --server gunicorn --concurrency 16 --duration 30
+    python benchmarks/load_test_fibrosis.py --server gunicorn --env WEB_CONCURRENCY=2 --env MAX_BATCH=32
+    python benchmarks/load_test_fibrosis.py --url http://localhost:5000 --concurrency 8
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_fibrosis import load_images, synthetic_images  # noqa: E402
+from latency_stats import percentile  # noqa: E402
+
+# Same command as startCommand in render.yaml; --bind is added per run
+GUNICORN_COMMAND = ['gunicorn', '-c', 'gunicorn.conf.py', 'app:app']
+
+FLASK_SERVER = """
+import sys
+import app
+app.start_warm_up()
+app.app.run(host='127.0.0.1', port=int(sys.argv[1]), threaded=True)
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(kind, port, env):
+    if kind == 'gunicorn':
+        command = GUNICORN_COMMAND + ['--bind', f'127.0.0.1:{port}']
+    else:
+        command = [sys.executable, '-c', FLASK_SERVER, str(port)]
+    return subprocess.Popen(command, cwd=ROOT, env=env)
+
+
+def wait_ready(url, timeout):
+    """Poll /ready until it answers 200 (the model is loaded and warmed up)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url + '/ready', timeout=2) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.25)
+    raise TimeoutError(f"{url} was not ready after {timeout:.0f}s")
+
+
+def multipart_body(field, filename, data):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f'Content-Type: image/jpeg\r\n\r\n'
+    ).encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+class Client(threading.Thread):
+    """One simulated user posting images back to back on a keep-alive connection."""
+
+    def __init__(self, index, url, bodies, start_at, stop_at, warmup_until):
+        super().__init__(name=f'client-{index}', daemon=True)
+        self.url = urllib.parse.urlsplit(url)
+        self.bodies = bodies
+        self.offset = index
+        self.start_at = start_at
+        self.stop_at = stop_at
+        self.warmup_until = warmup_until
+        self.latencies = []
+        self.errors = {}
+
+    def _connect(self):
+        return http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=60)
+
+    def run(self):
+        connection = self._connect()
+        i = self.offset
+        while time.monotonic() < self.start_at:
+            time.sleep(0.001)
+        while time.monotonic() < self.stop_at:
+            body, content_type = self.bodies[i % len(self.bodies)]
+            i += 1
+            start = time.monotonic()
+            try:
+                connection.request('POST', '/predict', body=body, headers={'Content-Type': content_type})
+                response = connection.getresponse()
+                response.read()
+                outcome = response.status
+            except (OSError, http.client.HTTPException) as e:
+                outcome = type(e).__name__
+                connection.close()
+                connection = self._connect()
+            elapsed = time.monotonic() - start
+            if start < self.warmup_until:
+                continue
+            if outcome == 200:
+                self.latencies.append(elapsed)
+            else:
+                self.errors[str(outcome)] = self.errors.get(str(outcome), 0) + 1
+        connection.close()
+
+
+def run_load(url, bodies, concurrency, duration, warmup):
+    start_at = time.monotonic() + 0.5
+    warmup_until = start_at + warmup
+    stop_at = warmup_until + duration
+    clients = [Client(i, url, bodies, start_at, stop_at, warmup_until) for i in range(concurrency)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+
+    latencies = [latency for client in clients for latency in client.latencies]
+    errors = {}
+    for client in clients:
+        for outcome, count in client.errors.items():
+            errors[outcome] = errors.get(outcome, 0) + count
+    return {
+        'concurrency': concurrency,
+        'duration_s': duration,
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': len(latencies) / duration,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+        'p95_ms': percentile(latencies, 95) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 99) * 1000 if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="Target an already running service instead of starting one")
+    parser.add_argument('--server', default='gunicorn', choices=['flask', 'gunicorn'])
+    parser.add_argument('--backend', default='random', help="INFERENCE_BACKEND for the spawned server")
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help="Extra environment for the spawned server (repeatable)")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16],
+                        help="Concurrent clients; several values run one after the other")
+    parser.add_argument('--duration', type=float, default=20, help="Measured seconds per concurrency level")
+    parser.add_argument('--warmup', type=float, default=3, help="Unmeasured seconds before each level")
+    parser.add_argument('--images', help="Folder of test images (default: generated)")
+    parser.add_argument('--count', type=int, default=64, help="Number of generated images")
+    parser.add_argument('--size', type=int, default=1024, help="Side of the generated images in pixels")
+    parser.add_argument('--ready-timeout', type=float, default=120)
+    parser.add_argument('--output', help="Write the results as JSON")
+    args = parser.parse_args()
+
+    images = load_images(args.images) if args.images else synthetic_images(args.count, args.size)
+    if not images:
+        parser.error(f"no images in {args.images}")
+    bodies = [multipart_body('image', f'image_{i}.jpg', data) for i, data in enumerate(images)]
+
+    process = None
+    url = args.url
+    env = {}
+    if url is None:
+        env = {'INFERENCE_BACKEND': args.backend, 'CACHE_MAX_ENTRIES': '0', 'ARCHIVE_UPLOADS': '0'}
+        for item in args.env:
+            key, _, value = item.partition('=')
+            env[key] = value
+        port = free_port()
+        url = f'http://127.0.0.1:{port}'
+        process = start_server(args.server, port, dict(os.environ, **env))
+
+    try:
+        wait_ready(url, args.ready_timeout)
+        levels = []
+        for concurrency in args.concurrency:
+            result = run_load(url, bodies, concurrency, args.duration, args.warmup)
+            levels.append(result)
+            print(f"c={concurrency:<3} {result['throughput_rps']:>8.1f} req/s  p50 {result['p50_ms'] or 0:.1f} ms  "
+                  f"p95 {result['p95_ms'] or 0:.1f} ms  p99 {result['p99_ms'] or 0:.1f} ms  errors {result['errors']}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'target': args.url or args.server,
+        'server_env': env,
+        'images': len(images),
+        'levels': levels,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
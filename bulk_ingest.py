@@ -0,0 +1,177 @@
+"""
+Headless bulk ingestion of Egyptian ID card scans.
+
+Walks a folder (recursively) or a .zip of card images, analyzes them with Azure
+with bounded parallelism, extracts the fields with the same logic as the
+Streamlit app and inserts them into Extracted_ID with array DML. Every file that
+has been committed (or was already registered) is appended to a checkpoint
+file, so a rerun skips it.
+
+Credentials are read from .streamlit/secrets.toml ([api_credentials]), like the apps
+(another file with SECRETS_PATH).
+
+Example:
+    python bulk_ingest.py scans/ --type list --concurrency 8 --batch-size 50
+    python bulk_ingest.py backlog.zip --checkpoint backlog.done
+"""
+import argparse
+import os
+import zipfile
+
+from app_secrets import load_secrets
+from extracted_id_writer import ExtractedIdWriter
+from id_extraction import INSERT_EXTRACTED_ID_BY_HASH_SQL, build_extracted_id_row, extract_id_fields, get_mime_type
+from image_normalize import MAX_SIDE, normalize_card_image
+from image_store import OracleImageStore, image_sha256
+from ocr_async import analyze_documents
+from ocr_profiles import ANALYSIS_PROFILES, DEFAULT_PROFILE, get_profile
+from oracle_pool import create_pool, make_dsn
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+
+
+def load_credentials():
+    return dict(load_secrets()["api_credentials"])
+
+
+def list_sources(source):
+    """
+    Return (name, reader) pairs for every image in a folder or zip archive.
+    `name` is stable across runs and is what the checkpoint records.
+    """
+    if zipfile.is_zipfile(source):
+        archive = zipfile.ZipFile(source)
+        return [
+            (info.filename, lambda info=info: archive.read(info))
+            for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+
+    sources = []
+    for root, _, files in os.walk(source):
+        for file_name in sorted(files):
+            if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(root, file_name)
+                name = os.path.relpath(path, source)
+                sources.append((name, lambda path=path: open(path, 'rb').read()))
+    sources.sort(key=lambda item: item[0])
+    return sources
+
+
+def load_checkpoint(checkpoint_path):
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def read_document(name, read, max_side):
+    """Read one scan and normalize it (see image_normalize.py); returns (bytes, mime_type)."""
+    img_bytes = read()
+    if not max_side:
+        return img_bytes, get_mime_type(name)
+    normalized = normalize_card_image(img_bytes, max_side=max_side)
+    return normalized.data, normalized.mime_type
+
+
+def ingest(source, card_type, checkpoint_path, credentials, profile=DEFAULT_PROFILE,
+           concurrency=8, batch_size=50, dry_run=False, max_side=MAX_SIDE):
+    profile = get_profile(profile)
+    done = load_checkpoint(checkpoint_path)
+    pending = [item for item in list_sources(source) if item[0] not in done]
+    print(f"{len(done)} already done, {len(pending)} to process")
+
+    counts = {'inserted': 0, 'duplicates': 0, 'failed': 0}
+    checkpoint = open(checkpoint_path, 'a', encoding='utf-8')
+
+    def on_flush(report):
+        # Only checkpoint once the rows are committed; duplicates are already in the table
+        for name in report.inserted + report.duplicates:
+            checkpoint.write(name + '\n')
+        checkpoint.flush()
+        for name in report.duplicates:
+            print(f"Already registered: {name}")
+        for name, message in report.errors:
+            print(f"Insert failed for {name}: {message}")
+        counts['inserted'] += len(report.inserted)
+        counts['duplicates'] += len(report.duplicates)
+        counts['failed'] += len(report.errors)
+        print(f"{counts['inserted']} inserted, {counts['duplicates']} duplicates, {counts['failed']} failed")
+
+    writer = None
+    if not dry_run:
+        pool = create_pool(credentials['user'], credentials['pass'], make_dsn(credentials),
+                           min_sessions=1, max_sessions=2)
+        # Images are stored on the flush session and committed with their rows
+        writer = ExtractedIdWriter(pool, max_rows=batch_size, max_delay_seconds=float('inf'), on_flush=on_flush,
+                                   sql=INSERT_EXTRACTED_ID_BY_HASH_SQL, image_store=OracleImageStore(pool))
+
+    try:
+        for batch in chunked(pending, batch_size):
+            names, documents, mime_types = [], [], []
+            for name, read in batch:
+                try:
+                    img_bytes, mime_type = read_document(name, read, max_side)
+                except Exception as e:
+                    # A corrupt or non-image file fails on its own, like an OCR error,
+                    # and is not checkpointed, so a rerun tries it again
+                    print(f"Could not read {name}: {e}")
+                    counts['failed'] += 1
+                    continue
+                names.append(name)
+                documents.append(img_bytes)
+                mime_types.append(mime_type)
+            if not documents:
+                continue
+
+            results = analyze_documents(credentials['endpoint'], credentials['api_key'], documents,
+                                        model_id=profile.model_id, max_concurrency=concurrency,
+                                        **profile.analyze_kwargs())
+
+            for name, img_bytes, mime_type, result in zip(names, documents, mime_types, results):
+                if isinstance(result, Exception):
+                    print(f"OCR failed for {name}: {result}")
+                    counts['failed'] += 1
+                    continue
+                record = extract_id_fields(result)
+                if writer is None:
+                    print(name, record)
+                    continue
+                writer.add(build_extracted_id_row(record, img_bytes, mime_type, card_type,
+                                                  img_sha256=image_sha256(img_bytes)),
+                           key=name, image=(img_bytes, mime_type))
+    finally:
+        if writer is not None:
+            writer.close()
+        checkpoint.close()
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help="Folder or .zip of ID card images")
+    parser.add_argument('--type', default='list', help="Value stored in Extracted_ID.type (list / OTM-PROJECT)")
+    parser.add_argument('--checkpoint', help="Progress file, defaults to <source>.checkpoint")
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, choices=sorted(ANALYSIS_PROFILES),
+                        help="Azure analysis profile (see ocr_profiles.py)")
+    parser.add_argument('--concurrency', type=int, default=8, help="Azure analyses in flight")
+    parser.add_argument('--batch-size', type=int, default=50, help="Rows per database round trip")
+    parser.add_argument('--max-side', type=int, default=MAX_SIDE,
+                        help="Downscale scans to this long side before OCR/storage (0 keeps originals)")
+    parser.add_argument('--dry-run', action='store_true', help="Run OCR and extraction without writing to Oracle")
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or os.path.normpath(args.source) + '.checkpoint'
+    ingest(args.source, args.type, checkpoint_path, load_credentials(), profile=args.profile,
+           concurrency=args.concurrency, batch_size=args.batch_size, dry_run=args.dry_run,
+           max_side=args.max_side)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Convert the Keras fibrosis model to TFLite or ONNX for the lighter inference backends.
+
+Examples:
+    python convert_model.py Dense_model.h5 --format tflite
+    python convert_model.py Dense_model.h5 --format tflite --quantize int8 --calibration-dir samples/
+    python convert_model.py Dense_model_.h5 --format onnx
+"""
+import argparse
+import os
+
+import numpy as np
+
+from inference_backends import resolve_model_path
+from preprocessing import IMG_HEIGHT, IMG_WIDTH, preprocess_image
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def representative_dataset(calibration_dir, limit=100):
+    # int8 calibration needs real inputs to pick quantization ranges
+    paths = sorted(
+        os.path.join(calibration_dir, name)
+        for name in os.listdir(calibration_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )[:limit]
+    if not paths:
+        raise SystemExit(f"No images found in {calibration_dir}")
+
+    def generator():
+        for path in paths:
+            yield [preprocess_image(path)]
+
+    return generator
+
+
+def convert_to_tflite(model, output_path, quantize=None, calibration_dir=None):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize == 'dynamic':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif quantize == 'int8':
+        if not calibration_dir:
+            raise SystemExit("--quantize int8 needs --calibration-dir with sample ultrasound images")
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset(calibration_dir)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+
+    with open(output_path, 'wb') as f:
+        f.write(converter.convert())
+
+
+def convert_to_onnx(model, output_path, opset=13):
+    import tensorflow as tf
+    import tf2onnx
+
+    input_signature = [tf.TensorSpec((None, IMG_HEIGHT, IMG_WIDTH, 3), tf.float32, name='input')]
+    tf2onnx.convert.from_keras(model, input_signature=input_signature, opset=opset, output_path=output_path)
+
+
+def check_outputs(keras_model, output_path, backend):
+    # Compare the converted model against Keras on a random batch
+    from inference_backends import BACKENDS
+
+    batch = np.random.rand(4, IMG_HEIGHT, IMG_WIDTH, 3).astype(np.float32)
+    expected = keras_model.predict(batch, verbose=0)
+    actual = BACKENDS[backend](output_path).predict(batch)
+    print(f"max abs diff vs keras: {np.max(np.abs(expected - actual)):.6f}")
+    print(f"argmax agreement: {np.mean(expected.argmax(axis=1) == actual.argmax(axis=1)):.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('model', help="Keras .h5 model, e.g. Dense_model.h5")
+    parser.add_argument('--format', choices=['tflite', 'onnx'], default='tflite')
+    parser.add_argument('--quantize', choices=['dynamic', 'int8'], help="TFLite only")
+    parser.add_argument('--calibration-dir', help="Images used to calibrate int8 quantization")
+    parser.add_argument('--output', help="Defaults to the model path with a .tflite/.onnx extension")
+    parser.add_argument('--opset', type=int, default=13, help="ONNX opset")
+    args = parser.parse_args()
+
+    from tensorflow.keras.models import load_model
+
+    backend = 'tflite' if args.format == 'tflite' else 'onnxruntime'
+    output_path = args.output or resolve_model_path(args.model, backend)
+    model = load_model(args.model)
+
+    if args.format == 'tflite':
+        convert_to_tflite(model, output_path, args.quantize, args.calibration_dir)
+    else:
+        convert_to_onnx(model, output_path, args.opset)
+
+    print(f"Wrote {output_path} ({os.path.getsize(output_path) / 1e6:.1f} MB)")
+    check_outputs(model, output_path, backend)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+from id_extraction import INSERT_EXTRACTED_ID_SQL
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_ERROR_CODE = "ORA-00001"  # unique constraint violated, card already registered
+
+# Lost connections, unreachable listener, database starting or shutting down
+TRANSIENT_ERROR_CODES = ('DPY-4011', 'DPY-6005', 'ORA-01033', 'ORA-01089', 'ORA-03113', 'ORA-03114',
+                         'ORA-03135', 'ORA-12170', 'ORA-12514', 'ORA-12537', 'ORA-12541')
+
+
+def is_duplicate_error(error):
+    return str(error).startswith(DUPLICATE_ERROR_CODE)
+
+
+def is_transient_db_error(error):
+    """True for python-oracledb errors that may succeed when retried later."""
+    detail = error.args[0] if getattr(error, 'args', None) else None
+    return bool(getattr(detail, 'isrecoverable', False)) or str(error).startswith(TRANSIENT_ERROR_CODES)
+
+
+class FlushReport(NamedTuple):
+    """Outcome of one flush; `duplicates` and `errors` hold the keys passed to add()."""
+    inserted: list
+    duplicates: list
+    errors: list  # (key, message) pairs
+
+
+class ExtractedIdWriter:
+    """
+    Buffer Extracted_ID rows and write them with array DML.
+
+    Rows are flushed with one cursor.executemany(..., batcherrors=True) and one
+    commit once `max_rows` are buffered or the oldest buffered row is older
+    than `max_delay_seconds`. A failing row (e.g. ORA-00001 for a card that is
+    already registered) is reported per row and does not abort the batch. If
+    the flush itself fails (lost connection, database down) the rows stay
+    buffered and go out with the next flush.
+
+    Rows added with an `image` have it stored through `image_store` on the
+    flush session, in the same transaction as the rows; images of rows that
+    failed are discarded again unless another row references them.
+
+    Args:
+        pool: Anything with acquire() returning a python-oracledb connection (see oracle_pool.py).
+        max_rows (int): Flush when this many rows are buffered.
+        max_delay_seconds (float): Flush when the oldest buffered row has waited this long.
+        on_flush (callable): Optional callback(FlushReport) after every flush.
+        auto_flush (bool): Start a background thread that enforces `max_delay_seconds`
+                           even when no new rows arrive.
+        sql (str): Insert statement with named binds matching the rows.
+        image_store: OracleImageStore for rows added with an image (then use INSERT_EXTRACTED_ID_BY_HASH_SQL).
+    """
+
+    def __init__(self, pool, max_rows=100, max_delay_seconds=5.0, on_flush=None, auto_flush=False,
+                 sql=INSERT_EXTRACTED_ID_SQL, image_store=None):
+        self.pool = pool
+        self.max_rows = max_rows
+        self.max_delay_seconds = max_delay_seconds
+        self.on_flush = on_flush
+        self.sql = sql
+        self.image_store = image_store
+        self._keys = []
+        self._rows = []
+        self._images = []
+        self._oldest = None
+        self._lock = threading.RLock()
+        self._closed = threading.Event()
+        self._thread = None
+        if auto_flush:
+            self._thread = threading.Thread(target=self._auto_flush, name="extracted-id-writer", daemon=True)
+            self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, row, key=None, image=None):
+        """
+        Buffer one row of bind variables; `key` identifies it in reports. With
+        `image` ((bytes, mime_type)) the row's img_sha256 is set when it is stored
+        at flush time. Returns a FlushReport if this add flushed.
+        """
+        with self._lock:
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._keys.append(key)
+            self._rows.append(row)
+            self._images.append(image)
+            if self._due():
+                return self.flush()
+        return None
+
+    def _due(self):
+        return len(self._rows) >= self.max_rows or (
+            self._oldest is not None and time.monotonic() - self._oldest >= self.max_delay_seconds)
+
+    def flush(self):
+        """Write everything buffered; returns a FlushReport. On error the rows are kept and the error raised."""
+        with self._lock:
+            keys, rows, images = self._keys, self._rows, self._images
+            if not rows:
+                return FlushReport([], [], [])
+
+            with self.pool.acquire() as connection:
+                for row, image in zip(rows, images):
+                    if image is not None:
+                        row['img_sha256'] = self.image_store.put(*image, connection=connection)
+                with connection.cursor() as cursor:
+                    cursor.executemany(self.sql, rows, batcherrors=True)
+                    batch_errors = cursor.getbatcherrors()
+                failed_images = {rows[error.offset]['img_sha256'] for error in batch_errors
+                                 if images[error.offset] is not None}
+                if failed_images:
+                    self.image_store.discard_unreferenced(sorted(failed_images), connection)
+                connection.commit()
+            # Only dropped from the buffer once committed
+            self._keys, self._rows, self._images, self._oldest = [], [], [], None
+
+            failed_offsets = set()
+            duplicates, errors = [], []
+            for error in batch_errors:
+                failed_offsets.add(error.offset)
+                if error.full_code == DUPLICATE_ERROR_CODE:
+                    duplicates.append(keys[error.offset])
+                else:
+                    errors.append((keys[error.offset], error.message))
+            inserted = [key for offset, key in enumerate(keys) if offset not in failed_offsets]
+
+            report = FlushReport(inserted, duplicates, errors)
+            if self.on_flush is not None:
+                self.on_flush(report)
+            return report
+
+    def _auto_flush(self):
+        interval = max(self.max_delay_seconds / 4, 0.05)
+        wait = interval
+        while not self._closed.wait(wait):
+            wait = interval
+            with self._lock:
+                if not (self._rows and self._due()):
+                    continue
+                try:
+                    self.flush()
+                except Exception:
+                    # The thread keeps running and the rows stay buffered; the next
+                    # try waits a full max_delay_seconds
+                    logger.exception("Flushing %d Extracted_ID rows failed", len(self._rows))
+                    wait = max(self.max_delay_seconds, interval)
+
+    def close(self):
+        """Stop the background thread and flush what is left."""
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.flush()
@@ -0,0 +1,18 @@
+import os
+
+# Import app.py once in the master so workers fork with Flask, NumPy and Pillow
+# already loaded. The model is not part of that: each worker loads it after fork.
+preload_app = os.environ.get('PRELOAD_APP', '1') == '1'
+
+# Threaded workers so /predict requests can be micro-batched (see batching.py)
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+
+def post_worker_init(worker):
+    # Load and warm up the model per worker, after fork; /ready reports 503
+    # until it has finished
+    from app import start_warm_up
+    start_warm_up()
@@ -0,0 +1,362 @@
+"""
+Field extraction helpers for Egyptian national ID cards, shared by the
+Streamlit apps and the headless batch tools. Nothing here depends on Streamlit.
+"""
+import mimetypes
+from datetime import date, datetime
+from typing import NamedTuple, Optional
+
+# helpers
+
+# Character classes, precomputed once as a codepoint -> bit flags table so a
+# line is classified in a single pass instead of one regex scan per class
+_ARABIC_CHAR = 1      # U+0600-U+06FF, U+0750-U+077F
+_ARABIC_NUM = 2       # ٠-٩
+_ENGLISH_NUM = 4      # 0-9
+_ENGLISH_CHAR = 8     # A-Z, a-z
+_ARABIC_LETTER = 16   # ء-ي
+_DIACRITIC = 32       # Arabic diacritical marks (تشكيل): Fathatan .. Sukun
+
+
+def _build_char_flags():
+    flags = {}
+
+    def mark(start, end, flag):
+        for code in range(ord(start), ord(end) + 1):
+            flags[chr(code)] = flags.get(chr(code), 0) | flag
+
+    mark('\u0600', '\u06FF', _ARABIC_CHAR)
+    mark('\u0750', '\u077F', _ARABIC_CHAR)
+    mark('\u0660', '\u0669', _ARABIC_NUM)
+    mark('0', '9', _ENGLISH_NUM)
+    mark('A', 'Z', _ENGLISH_CHAR)
+    mark('a', 'z', _ENGLISH_CHAR)
+    mark('\u0621', '\u064A', _ARABIC_LETTER)
+    mark('\u064B', '\u0652', _DIACRITIC)
+    return flags
+
+
+_CHAR_FLAGS = _build_char_flags()
+
+
+class LineClass(NamedTuple):
+    text_type: str
+    length: int
+    has_diacritics: bool
+
+
+def classify_line(text):
+    """
+    Classify one OCR line in a single pass.
+
+    Args:
+        text (str): The line text.
+
+    Returns:
+        LineClass: text_type ("ara", "ara_num", "eng_num", "eng_mix", "ara_mix", "eng" or "unknown"),
+                   length without spaces, and whether it has Arabic letters with diacritics.
+    """
+    flags = 0
+    for char in set(text):
+        flags |= _CHAR_FLAGS.get(char, 0)
+
+    if flags & _ARABIC_CHAR and flags & _ARABIC_NUM:
+        text_type = "ara_mix"  # Mixed Arabic characters and numbers
+    elif flags & _ARABIC_CHAR:
+        text_type = "ara"  # Arabic characters only
+    elif flags & _ARABIC_NUM:
+        text_type = "ara_num"  # Arabic numbers only
+    elif flags & _ENGLISH_NUM and flags & _ENGLISH_CHAR:
+        text_type = "eng_mix"  # Mixed English characters and numbers
+    elif flags & _ENGLISH_NUM:
+        text_type = "eng_num"  # English numbers only
+    elif flags & _ENGLISH_CHAR:
+        text_type = "eng"  # English characters only
+    else:
+        text_type = "unknown"  # Unknown or other characters
+
+    has_diacritics = bool(flags & _ARABIC_LETTER and flags & _DIACRITIC)
+    return LineClass(text_type, len(text) - text.count(" "), has_diacritics)
+
+
+def classify_lines(texts):
+    """Classify all lines of a page at once; returns a list of LineClass in input order."""
+    return [classify_line(text) for text in texts]
+
+
+def has_arabic_with_diacritics(text):
+    """
+    Check if text contains Arabic letters with diacritical marks (تشكيل).
+    Args:
+        text (str): The text to check
+    Returns:
+        bool: True if text contains Arabic letters with diacritics, False otherwise
+    """
+    return classify_line(text).has_diacritics
+
+
+def check_text_type_with_len(text):
+    """
+    Check the type of text based on Arabic/English characters and numbers, and return the length of the text.
+
+    Args:
+        text (str): The input string to check.
+
+    Returns:
+        tuple: A tuple containing the type of text ("ara", "ara_num", "eng_num", "eng_mix", "ara_mix", or "unknown")
+               and the length of the text.
+    """
+    text_type, length, _ = classify_line(text)
+    return text_type, length
+
+
+def sort_ocr_lines(lines):
+    # Sort lines using their top coordinate
+    def get_top_coordinate(line):
+        try:
+            # Try different potential attributes for getting position
+            if hasattr(line, 'polygon'):
+                return line.polygon[1].y  # If polygon is available
+            elif hasattr(line, 'boundingBox'):
+                return line.boundingBox[1]  # Alternative attribute name
+            elif hasattr(line, 'bbox'):
+                return line.bbox[1]  # Another possible attribute
+            else:
+                # If no position attribute is found, use index as fallback
+                return lines.index(line)
+        except Exception as e:
+            print(f"Error sorting line: {e}")
+            return lines.index(line)
+
+    # Sort lines based on top coordinate
+    return sorted(lines, key=get_top_coordinate)
+
+# Function to guess MIME type based on file extension
+def get_mime_type(file_name):
+    mime_type, _ = mimetypes.guess_type(file_name)
+    return mime_type or "application/octet-stream"  # Default MIME type if unknown
+
+def arabic_to_english_numerals(arabic_str):
+    """Convert Arabic/Persian numerals to English numerals while maintaining original grouping."""
+    numeral_map = {
+        '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+        '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9'
+    }
+
+    print("arabic_str", arabic_str)
+
+    # Split the string by spaces to maintain groups
+    groups = arabic_str.split()
+
+    # Convert each group to English numerals
+    english_groups = []
+    for group in groups:
+        english_group = ''
+        for char in group[::-1]:
+            english_group += numeral_map.get(char, char)
+        english_groups.append(english_group)
+
+    print("english_chars", english_groups)
+
+    # Join all digits for final processing
+    english_str = ''.join(english_groups)
+    return english_str[::-1]
+def extract_birthday(id_number):
+    """Extract birthday from ID number, supporting both English and Arabic numerals."""
+    try:
+        # Convert Arabic numerals to English if necessary
+        cleaned_id = arabic_to_english_numerals(id_number)
+        print(cleaned_id)
+        # Remove any remaining non-numeric characters
+        cleaned_id = ''.join(filter(str.isdigit, cleaned_id))
+
+        # Validate ID number length
+        # if len(cleaned_id) < 14:
+        #     return "Invalid ID number: Too short"
+
+        # Extract year, month, and day
+        year_digits = cleaned_id[1:3]
+        month_digits = cleaned_id[3:5]
+        day_digits = cleaned_id[5:7]
+
+        # Convert to integers
+        year = int(year_digits)
+        month = min(max(int(month_digits), 1), 12)
+        day = min(max(int(day_digits), 1), 31)
+
+        # Determine century
+        current_year = datetime.now().year
+        if year > 40:  # Assume 1900-1950 range
+            full_year = 1900 + year
+        else:  # Assume 2000-2050 range
+            full_year = 2000 + year
+
+        # Construct date
+        birthday = datetime(full_year, month, day)
+        return birthday.strftime("%Y-%m-%d")
+
+    except Exception as e:
+        return "2000-01-01"
+
+
+EXTRACTED_FIELDS = ('id', 'factory_num', 'first_name', 'second_name', 'address', 'address2')
+
+
+class IdCardRecord(NamedTuple):
+    """Immutable result of field extraction for one card; missing fields are None."""
+    id: Optional[str] = None
+    factory_num: Optional[str] = None
+    first_name: Optional[str] = None
+    second_name: Optional[str] = None
+    address: Optional[str] = None
+    address2: Optional[str] = None
+
+
+class Point(NamedTuple):
+    x: float
+    y: float
+
+
+class OcrLine(NamedTuple):
+    """Minimal stand-in for an Azure DocumentLine: the text and its polygon points."""
+    content: str
+    polygon: tuple
+
+
+def new_extracted_info():
+    """Empty extraction dict, as kept in st.session_state.extracted_info."""
+    return {field: None for field in EXTRACTED_FIELDS}
+
+
+def _page_lines(source):
+    # Accept an analysis result (first page is used), a list of Azure lines,
+    # or a plain list of (text, polygon) pairs with polygon as (x, y) pairs
+    if hasattr(source, 'pages'):
+        return source.pages[0].lines
+    lines = []
+    for line in source:
+        if isinstance(line, tuple) and not hasattr(line, 'content'):
+            content, polygon = line
+            line = OcrLine(content, tuple(Point(*point) for point in polygon))
+        lines.append(line)
+    return lines
+
+
+def extract_id_fields(source):
+    """
+    Extract the ID card fields from OCR lines. Pure: no Streamlit, no shared state.
+
+    Args:
+        source: An Azure AnalyzeResult, a list of DocumentLine-like objects
+                (.content, .polygon) or a list of (text, [(x, y), ...]) pairs.
+
+    Returns:
+        IdCardRecord: The extracted fields.
+    """
+    fields = new_extracted_info()
+    sorted_page_lines = sort_ocr_lines(_page_lines(source))
+    line_classes = classify_lines([line.content for line in sorted_page_lines])
+
+    for line, (text_type, len_text, result) in zip(sorted_page_lines, line_classes):
+        # Skip unwanted lines
+        if result or ('بطاقة' in line.content) or ('الشخصية' in line.content) or ('/' in line.content):
+            continue
+
+        # Extract information logic
+        if not fields['id'] and text_type == 'ara_mix' and len_text == 14:
+            fields['id'] = line.content
+
+        elif not fields['factory_num'] and text_type == 'eng_mix' and len_text > 5:
+            fields['factory_num'] = line.content
+
+        elif not fields['first_name'] and text_type == 'ara' and len_text < 10:
+            fields['first_name'] = line.content
+
+        elif not fields['second_name'] and text_type == 'ara' and len_text > 9:
+            fields['second_name'] = line.content
+
+        elif not fields['address'] and (
+                text_type == 'ara_mix' or text_type == 'ara') and len_text >= 5:
+            fields['address'] = line.content
+
+        elif not fields['address2'] and (
+                text_type == 'ara_mix' or text_type == 'ara') and len_text >= 5:
+            fields['address2'] = line.content
+
+        # Break if all information is extracted
+        if all(fields.values()):
+            break
+
+    return IdCardRecord(**fields)
+
+
+# Function to process OCR lines and extract information
+def process_ocr_lines(layout_result, extracted_info):
+    """
+    Fill the empty entries of `extracted_info` (see new_extracted_info), e.g.
+    st.session_state.extracted_info, from extract_id_fields(layout_result).
+    """
+    record = extract_id_fields(layout_result)
+    for field, value in record._asdict().items():
+        if not extracted_info[field]:
+            extracted_info[field] = value
+    return extracted_info
+
+
+# ----------------- database rows
+
+# SQL statement to insert data
+INSERT_EXTRACTED_ID_SQL = """
+INSERT INTO Extracted_ID (
+    id, P_id, name, address, date_column, stamp,
+    img, mime_type, last_update_img, created_by, type, factory_num
+) VALUES (
+    extracted_id_seq.NEXTVAL, :p_id, :name, :address, :date_column, :stamp,
+    :img, :mime_type, :last_update_img, :created_by, :type, :factory_num
+)
+"""
+
+# Same row referencing an image in Extracted_ID_Image by hash (see image_store.py)
+INSERT_EXTRACTED_ID_BY_HASH_SQL = """
+INSERT INTO Extracted_ID (
+    id, P_id, name, address, date_column, stamp,
+    img_sha256, mime_type, last_update_img, created_by, type, factory_num
+) VALUES (
+    extracted_id_seq.NEXTVAL, :p_id, :name, :address, :date_column, :stamp,
+    :img_sha256, :mime_type, :last_update_img, :created_by, :type, :factory_num
+)
+"""
+
+
+def build_extracted_id_row(extracted_info, img_bytes, mime_type, card_type, created_by=' ', img_sha256=None):
+    """
+    Bind variables for INSERT_EXTRACTED_ID_SQL from one card's extracted fields.
+    `extracted_info` may be an extraction dict or an IdCardRecord. When `img_sha256`
+    is given the row is for INSERT_EXTRACTED_ID_BY_HASH_SQL and `img_bytes` is not bound.
+    """
+    if isinstance(extracted_info, IdCardRecord):
+        extracted_info = extracted_info._asdict()
+    if extracted_info['id'] is not None:
+        birthday = extract_birthday(extracted_info['id'])
+    else:
+        birthday = "2000-01-01"
+    name = ' '.join(part for part in (extracted_info['first_name'], extracted_info['second_name']) if part)
+    address = ' '.join(part for part in (extracted_info['address'], extracted_info['address2']) if part)
+
+    row = {
+        'p_id': extracted_info['id'] or '',
+        'name': name,
+        'address': address,
+        'date_column': datetime.strptime(birthday, "%Y-%m-%d").date(),
+        'stamp': datetime.now(),
+        'mime_type': mime_type,
+        'last_update_img': date.today(),
+        'created_by': created_by,
+        'type': card_type,
+        'factory_num': extracted_info['factory_num']
+    }
+    if img_sha256 is not None:
+        row['img_sha256'] = img_sha256
+    else:
+        row['img'] = img_bytes
+    return row
@@ -0,0 +1,208 @@
+"""
+Background extraction jobs for ID card images, used by id_service.py.
+
+A job runs normalize -> OCR -> process_ocr_lines -> extract_birthday -> Oracle
+insert on a worker thread; its status is kept in a JobStore that callers poll
+or wait on for changes (the SSE endpoint). Nothing here depends on Flask or
+Streamlit.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from extracted_id_writer import is_duplicate_error
+from id_extraction import (EXTRACTED_FIELDS, INSERT_EXTRACTED_ID_BY_HASH_SQL, build_extracted_id_row,
+                           extract_birthday, new_extracted_info, process_ocr_lines)
+from image_normalize import normalize_card_image
+from ocr_backends import is_quota_error, is_transient_ocr_error
+from work_queue import backoff_delay, retry_after_seconds
+
+# queued -> running (stage: normalize / ocr / extract / insert) -> one of TERMINAL_STATES
+TERMINAL_STATES = ('done', 'incomplete', 'duplicate', 'failed')
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobStore:
+    """
+    Thread-safe in-memory job table. Finished jobs are dropped `ttl_seconds` after
+    their last update. Jobs live in one process: run the service with a single
+    worker process (and several threads).
+
+    Args:
+        ttl_seconds (float): How long finished jobs stay readable.
+    """
+
+    def __init__(self, ttl_seconds=3600):
+        self.ttl_seconds = ttl_seconds
+        self._jobs = {}
+        self._changed = threading.Condition()
+
+    def create(self, **fields):
+        now = time.time()
+        job = {'job_id': uuid.uuid4().hex, 'status': 'queued', 'stage': None, 'created': now, 'updated': now,
+               'version': 0, 'result': None, 'error': None, **fields}
+        with self._changed:
+            self._expire(now)
+            self._jobs[job['job_id']] = job
+        return dict(job)
+
+    def update(self, job_id, **fields):
+        with self._changed:
+            job = self._jobs[job_id]
+            job.update(fields, updated=time.time(), version=job['version'] + 1)
+            self._changed.notify_all()
+
+    def get(self, job_id):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def wait(self, job_id, version, timeout):
+        """Block until the job has a version other than `version` (or timeout); returns the job."""
+        with self._changed:
+            self._changed.wait_for(
+                lambda: job_id not in self._jobs or self._jobs[job_id]['version'] != version, timeout)
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def pending(self):
+        with self._changed:
+            return sum(job['status'] not in TERMINAL_STATES for job in self._jobs.values())
+
+    def _expire(self, now):
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['status'] in TERMINAL_STATES and now - job['updated'] > self.ttl_seconds]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+def insert_card(pool, image_store, extracted_info, img_bytes, mime_type, card_type, created_by=' '):
+    """
+    Store the image and insert the Extracted_ID row on one pooled session, in one
+    transaction; returns the image SHA-256. A failed insert leaves no orphan image.
+    """
+    with pool.acquire() as connection:
+        img_sha256 = image_store.put(img_bytes, mime_type, connection=connection)
+        row = build_extracted_id_row(extracted_info, img_bytes, mime_type, card_type, created_by=created_by,
+                                     img_sha256=img_sha256)
+        with connection.cursor() as cursor:
+            cursor.execute(INSERT_EXTRACTED_ID_BY_HASH_SQL, row)
+        connection.commit()
+    return img_sha256
+
+
+def public_job(job):
+    """The fields of a job that are returned to clients."""
+    return {key: job[key] for key in ('job_id', 'status', 'stage', 'created', 'updated', 'result', 'error')}
+
+
+class ExtractionJobRunner:
+    """
+    Run extraction jobs on a thread pool.
+
+    Args:
+        ocr_backend: Anything with analyze(image_bytes) (see ocr_backends.py).
+        pool: Oracle connection pool (see oracle_pool.create_pool); None to only extract.
+        image_store: OracleImageStore the card images go to (required with a pool).
+        store (JobStore): Where job status is kept.
+        workers (int): Jobs processed at once.
+        max_pending (int): submit() raises QueueFull past this many unfinished jobs.
+        telemetry: Optional id_telemetry.TelemetryLog; each job is one 'job' trace.
+        rate_limiter: Optional work_queue.TokenBucket the OCR backend takes a token from on
+                      every cache miss (see create_ocr_services); paused when Azure throttles.
+        ocr_attempts (int): OCR tries per job; throttling and transient errors are
+                            retried with exponential backoff (or the Retry-After Azure sends).
+    """
+
+    def __init__(self, ocr_backend, pool=None, image_store=None, store=None, workers=4, max_pending=100,
+                 telemetry=None, rate_limiter=None, ocr_attempts=1):
+        self.ocr_backend = ocr_backend
+        self.pool = pool
+        self.image_store = image_store
+        self.store = store or JobStore()
+        self.max_pending = max_pending
+        self.telemetry = telemetry
+        self.rate_limiter = rate_limiter
+        self.ocr_attempts = ocr_attempts
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='id-job')
+
+    def submit(self, img_bytes, card_type, created_by=' ', insert=True):
+        """Queue one card image; returns the new job (status 'queued')."""
+        if self.store.pending() >= self.max_pending:
+            raise QueueFull(f"{self.max_pending} jobs already pending")
+        job = self.store.create(card_type=card_type)
+        self._executor.submit(self._run, job['job_id'], img_bytes, card_type, created_by,
+                              insert and self.pool is not None)
+        return job
+
+    def _run(self, job_id, img_bytes, card_type, created_by, insert):
+        trace = self.telemetry.start('job', card_type=card_type, job_id=job_id) if self.telemetry else None
+        try:
+            result = self.process(job_id, img_bytes, card_type, created_by, insert, trace)
+        except Exception as e:
+            is_duplicate = is_duplicate_error(e)
+            if trace is not None:
+                trace.count('duplicates' if is_duplicate else 'errors')
+                trace.finish(error=e)
+            self.store.update(job_id, status='duplicate' if is_duplicate else 'failed', error=str(e))
+            return
+        if trace is not None:
+            trace.finish()
+        self.store.update(job_id, status=result.pop('status'), result=result)
+
+    def _stage(self, job_id, stage, trace):
+        self.store.update(job_id, status='running', stage=stage)
+        return trace.span(stage) if trace is not None else nullcontext()
+
+    def process(self, job_id, img_bytes, card_type, created_by=' ', insert=True, trace=None):
+        """The extraction pipeline for one card; returns the job result with its final status."""
+        with self._stage(job_id, 'normalize', trace):
+            normalized = normalize_card_image(img_bytes)
+
+        with self._stage(job_id, 'ocr', trace):
+            layout_result = self.analyze(normalized.data)
+
+        with self._stage(job_id, 'extract', trace):
+            extracted_info = process_ocr_lines(layout_result, new_extracted_info())
+            birthday = extract_birthday(extracted_info['id']) if extracted_info['id'] else None
+
+        missing = [field for field in EXTRACTED_FIELDS if not extracted_info[field]]
+        result = {'fields': extracted_info, 'birthday': birthday, 'missing_fields': missing, 'inserted': False}
+        # Unlike the Streamlit app, which inserts whatever was read, a card with
+        # unreadable fields is not registered; the client shows the fields for
+        # review and resubmits a better photo
+        if missing:
+            result['status'] = 'incomplete'
+            return result
+        if not insert:
+            result['status'] = 'done'
+            return result
+
+        with self._stage(job_id, 'insert', trace):
+            img_sha256 = insert_card(self.pool, self.image_store, extracted_info, normalized.data,
+                                     normalized.mime_type, card_type, created_by)
+        result.update(status='done', inserted=True, img_sha256=img_sha256)
+        return result
+
+    def analyze(self, img_bytes):
+        """OCR, retrying throttling and transient errors up to `ocr_attempts` times."""
+        for attempt in range(1, self.ocr_attempts + 1):
+            # The backend checks its cache before waiting for a rate-limiter token
+            try:
+                return self.ocr_backend.analyze(img_bytes)
+            except Exception as e:
+                if attempt >= self.ocr_attempts or not is_transient_ocr_error(e):
+                    raise
+                delay = retry_after_seconds(e) or backoff_delay(attempt)
+                if is_quota_error(e) and self.rate_limiter is not None:
+                    # Every worker backs off, not only the one that was throttled
+                    self.rate_limiter.pause(delay)
+                time.sleep(delay)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
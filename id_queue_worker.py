@@ -0,0 +1,197 @@
+"""
+Drain the durable ID card work queue (work_queue.py).
+
+Azure_final.py enqueues a card when Azure is out of quota or throttling
+('extract' items: the normalized image) or when the Oracle insert fails
+('insert' items: the image and the reviewed fields). This worker retries them:
+
+- Azure calls go through a token bucket set to the pricing tier's rate.
+- Throttling (429), quota (403) and transient Azure or Oracle errors are retried
+  with exponential backoff or Azure's Retry-After, up to --max-attempts.
+- Permanent errors, items out of attempts and extractions with missing fields
+  go to the dead-letter state. An ORA-00001 duplicate counts as done.
+
+Examples:
+    python id_queue_worker.py --tier F0 --workers 2
+    python id_queue_worker.py --once
+    python id_queue_worker.py --dead-letters
+    python id_queue_worker.py --requeue 42
+"""
+import argparse
+import json
+import threading
+import time
+
+from app_secrets import load_secrets
+from extracted_id_writer import is_duplicate_error, is_transient_db_error
+from id_extraction import EXTRACTED_FIELDS, new_extracted_info, process_ocr_lines
+from id_jobs import insert_card
+from ocr_backends import QUOTA_ERROR_PREFIX, is_quota_error, is_transient_ocr_error
+from work_queue import (AZURE_TIER_RATES, DEFAULT_MAX_ATTEMPTS, DurableWorkQueue, TokenBucket, backoff_delay,
+                        retry_after_seconds)
+
+DEFAULT_QUEUE_PATH = '.id_queue.sqlite'
+
+
+class IncompleteExtraction(Exception):
+    pass
+
+
+class QueueWorker:
+    """
+    Args:
+        queue (DurableWorkQueue): Where the items come from.
+        ocr_backend: Anything with analyze(image_bytes) (see ocr_backends.py).
+        pool: Oracle connection pool.
+        image_store: OracleImageStore.
+        rate_limiter (TokenBucket): The one the OCR backend takes a token from for every
+                                    Azure call that misses the cache; paused when Azure throttles.
+        max_attempts (int): Tries per item before it is dead-lettered.
+        quota_retry_seconds (float): Wait after "(403) Out of call volume quota"; the F0
+                                     quota is monthly, so fast retries only waste attempts.
+        telemetry: Optional id_telemetry.TelemetryLog; each item attempt is one 'queue' trace.
+    """
+
+    def __init__(self, queue, ocr_backend, pool, image_store, rate_limiter, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 quota_retry_seconds=3600, telemetry=None):
+        self.queue = queue
+        self.ocr_backend = ocr_backend
+        self.pool = pool
+        self.image_store = image_store
+        self.rate_limiter = rate_limiter
+        self.max_attempts = max_attempts
+        self.quota_retry_seconds = quota_retry_seconds
+        self.telemetry = telemetry
+        self._stop = threading.Event()
+
+    def process(self, item, meta):
+        """Run one item, updating `meta` with progress; returns the final metadata."""
+        if item.kind == 'extract' and 'extracted_info' not in meta:
+            layout_result = self.ocr_backend.analyze(item.payload)
+            extracted_info = process_ocr_lines(layout_result, new_extracted_info())
+            missing = [field for field in EXTRACTED_FIELDS if not extracted_info[field]]
+            if missing:
+                # Kept for whoever reviews the dead letter; a requeue runs OCR again
+                meta['partial_info'] = extracted_info
+                raise IncompleteExtraction(f"Missing fields after OCR: {', '.join(missing)}")
+            meta['extracted_info'] = extracted_info
+
+        try:
+            meta['img_sha256'] = insert_card(self.pool, self.image_store, meta['extracted_info'], item.payload,
+                                             meta['mime_type'], meta['card_type'], meta.get('created_by', ' '))
+            meta['result'] = 'inserted'
+        except Exception as e:
+            if not is_duplicate_error(e):
+                raise
+            meta['result'] = 'duplicate'
+        return meta
+
+    def retry_delay(self, error, attempt):
+        if str(error).startswith(QUOTA_ERROR_PREFIX):
+            return self.quota_retry_seconds
+        return retry_after_seconds(error) or backoff_delay(attempt)
+
+    def handle(self, item):
+        meta = dict(item.meta)
+        trace = self.telemetry.start('queue', kind=item.kind, item_id=item.id,
+                                     attempt=item.attempts) if self.telemetry else None
+        try:
+            meta = self.process(item, meta)
+        except Exception as e:
+            retryable = not isinstance(e, IncompleteExtraction) and (
+                is_transient_ocr_error(e) or is_transient_db_error(e))
+            if retryable and item.attempts < self.max_attempts:
+                delay = self.retry_delay(e, item.attempts)
+                if is_quota_error(e):
+                    # Throttling applies to the whole resource, so every worker waits
+                    self.rate_limiter.pause(delay)
+                self.queue.retry(item.id, e, delay, meta)
+                print(f"Item {item.id} attempt {item.attempts} failed, retrying in {delay:.0f}s: {e}")
+            else:
+                self.queue.dead_letter(item.id, e, meta)
+                print(f"Item {item.id} dead-lettered after {item.attempts} attempt(s): {e}")
+            if trace is not None:
+                trace.set(retry=retryable and item.attempts < self.max_attempts)
+                trace.finish(error=e)
+            return
+        self.queue.complete(item.id, meta)
+        print(f"Item {item.id} {meta['result']}")
+        if trace is not None:
+            trace.set(result=meta['result'])
+            trace.finish()
+
+    def run(self, once=False, poll_seconds=5.0):
+        """Process due items until stop() (or, with `once`, until none is due)."""
+        while not self._stop.is_set():
+            item = self.queue.lease()
+            if item is not None:
+                self.handle(item)
+                continue
+            if once:
+                return
+            due_in = self.queue.next_due_in()
+            self._stop.wait(poll_seconds if due_in is None else min(max(due_in, 0.1), poll_seconds))
+
+    def stop(self):
+        self._stop.set()
+
+
+def create_worker(queue, tier, rate_per_second=None, max_attempts=DEFAULT_MAX_ATTEMPTS, secrets_path=None):
+    """
+    Build the worker from the apps' secrets file ([api_credentials], [ocr], [ocr_cache], [telemetry];
+    see app_secrets.load_secrets for the default path).
+    """
+    from image_store import OracleImageStore
+    from ocr_backends import create_ocr_services
+    from oracle_pool import create_pool, make_dsn
+
+    secrets = load_secrets(secrets_path)
+    credentials = dict(secrets["api_credentials"])
+    rate_limiter = TokenBucket(rate_per_second or AZURE_TIER_RATES[tier])
+    services = create_ocr_services(secrets, rate_limiter)
+    pool = create_pool(credentials['user'], credentials['pass'], make_dsn(credentials), max_sessions=2)
+    return QueueWorker(queue, services.backend, pool, OracleImageStore(pool), rate_limiter,
+                       max_attempts=max_attempts, telemetry=services.telemetry)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queue', default=DEFAULT_QUEUE_PATH, help="SQLite queue file")
+    parser.add_argument('--tier', default='F0', choices=sorted(AZURE_TIER_RATES), help="Azure pricing tier")
+    parser.add_argument('--rate', type=float, help="Azure calls per second (overrides --tier)")
+    parser.add_argument('--workers', type=int, default=1, help="Items processed at once")
+    parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS)
+    parser.add_argument('--secrets', help="Secrets file (default $SECRETS_PATH or .streamlit/secrets.toml)")
+    parser.add_argument('--once', action='store_true', help="Exit when no item is due")
+    parser.add_argument('--dead-letters', action='store_true', help="List dead-lettered items and exit")
+    parser.add_argument('--requeue', type=int, nargs='+', metavar='ID', help="Retry dead-lettered items and exit")
+    args = parser.parse_args()
+
+    queue = DurableWorkQueue(args.queue)
+    if args.dead_letters:
+        for entry in queue.dead_letters():
+            print(json.dumps(entry, ensure_ascii=False))
+        return
+    if args.requeue:
+        for item_id in args.requeue:
+            print(item_id, 'requeued' if queue.requeue(item_id) else 'not dead-lettered')
+        return
+
+    print(f"Queue {args.queue}: {queue.counts()}")
+    worker = create_worker(queue, args.tier, args.rate, args.max_attempts, args.secrets)
+    threads = [threading.Thread(target=worker.run, kwargs={'once': args.once}, name=f'queue-worker-{i}')
+               for i in range(args.workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        worker.stop()
+        for thread in threads:
+            thread.join()
+    print(f"Queue {args.queue}: {queue.counts()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+from flask import Flask, Response, request, stream_with_context, url_for
+from flask import jsonify
+
+import json
+import os
+import threading
+
+from app_secrets import DEFAULT_SECRETS_PATH, load_secrets
+from id_jobs import TERMINAL_STATES, ExtractionJobRunner, JobStore, QueueFull, public_job
+from work_queue import AZURE_TIER_RATES, TokenBucket
+
+# HTTP intake for ID cards: POST an image, get a job id back at once, then poll
+# /jobs/<id> or follow /jobs/<id>/events (server-sent events) while a worker
+# pool runs OCR -> extraction -> Oracle insert (see id_jobs.py).
+#
+#     gunicorn -w 1 --threads 16 id_service:app
+#
+# Jobs are kept in this process, so run a single worker process.
+app = Flask(__name__)
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 10)) * 1024 * 1024
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 4))
+app.config['MAX_PENDING_JOBS'] = int(os.environ.get('MAX_PENDING_JOBS', 100))
+app.config['JOB_TTL_SECONDS'] = float(os.environ.get('JOB_TTL_SECONDS', 3600))
+# '0' extracts only, without writing to Oracle
+app.config['INSERT_RECORDS'] = os.environ.get('INSERT_RECORDS', '1') == '1'
+app.config['DEFAULT_CARD_TYPE'] = os.environ.get('DEFAULT_CARD_TYPE', 'list')
+# Azure calls are spread to the pricing tier's rate (see work_queue.py); bursts
+# wait for a token instead of failing, and throttled calls are retried
+app.config['AZURE_TIER'] = os.environ.get('AZURE_TIER', 'F0')
+app.config['OCR_RATE_PER_SECOND'] = float(os.environ.get('OCR_RATE_PER_SECOND',
+                                                         AZURE_TIER_RATES[app.config['AZURE_TIER']]))
+app.config['OCR_ATTEMPTS'] = int(os.environ.get('OCR_ATTEMPTS', 5))
+# Seconds between keep-alive comments on idle event streams
+app.config['SSE_KEEPALIVE_SECONDS'] = float(os.environ.get('SSE_KEEPALIVE_SECONDS', 15))
+# The Streamlit apps' secrets file, read without Streamlit (see app_secrets.py)
+app.config['SECRETS_PATH'] = os.environ.get('SECRETS_PATH', DEFAULT_SECRETS_PATH)
+
+job_store = JobStore(ttl_seconds=app.config['JOB_TTL_SECONDS'])
+runner = None
+_runner_lock = threading.Lock()
+
+
+def create_runner():
+    """
+    Build the OCR backend, Oracle pool and image store from the same secrets the
+    Streamlit apps use (SECRETS_PATH: [api_credentials], [ocr], [ocr_cache], [telemetry]).
+    """
+    from ocr_backends import create_ocr_services
+
+    secrets = load_secrets(app.config['SECRETS_PATH'])
+    credentials = dict(secrets["api_credentials"])
+    rate_limiter = TokenBucket(app.config['OCR_RATE_PER_SECOND'])
+    services = create_ocr_services(secrets, rate_limiter)
+
+    pool = image_store = None
+    if app.config['INSERT_RECORDS']:
+        from image_store import OracleImageStore
+        from oracle_pool import create_pool, make_dsn
+        pool = create_pool(credentials['user'], credentials['pass'], make_dsn(credentials),
+                           max_sessions=app.config['JOB_WORKERS'])
+        image_store = OracleImageStore(pool)
+
+    return ExtractionJobRunner(services.backend, pool, image_store, store=job_store,
+                               workers=app.config['JOB_WORKERS'], max_pending=app.config['MAX_PENDING_JOBS'],
+                               telemetry=services.telemetry, rate_limiter=rate_limiter,
+                               ocr_attempts=app.config['OCR_ATTEMPTS'])
+
+
+def get_runner():
+    global runner
+    if runner is None:
+        with _runner_lock:
+            if runner is None:
+                runner = create_runner()
+    return runner
+
+
+def job_response(job):
+    body = public_job(job)
+    body['status_url'] = url_for('job_status', job_id=job['job_id'])
+    body['events_url'] = url_for('job_events', job_id=job['job_id'])
+    return body
+
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    if 'image' not in request.files:
+        return jsonify({'error': 'No image provided'}), 400
+
+    file = request.files['image']
+    if file.filename == '':
+        return jsonify({'error': 'Empty filename'}), 400
+
+    card_type = request.form.get('type', app.config['DEFAULT_CARD_TYPE'])
+    created_by = request.form.get('created_by', ' ')
+    try:
+        job = get_runner().submit(file.read(), card_type, created_by=created_by)
+    except QueueFull as e:
+        # Clients back off and resubmit instead of waiting on a long queue
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 429
+
+    response = jsonify(job_response(job))
+    response.headers['Location'] = url_for('job_status', job_id=job['job_id'])
+    return response, 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job_response(job))
+
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+
+    def stream(job):
+        # One 'status' event per change, ending after the terminal one
+        version = None
+        while job is not None:
+            if job['version'] != version:
+                version = job['version']
+                yield f"event: status\ndata: {json.dumps(public_job(job), ensure_ascii=False)}\n\n"
+                if job['status'] in TERMINAL_STATES:
+                    return
+            else:
+                yield ": keep-alive\n\n"
+            job = job_store.wait(job_id, version, app.config['SSE_KEEPALIVE_SECONDS'])
+
+    return Response(stream_with_context(stream(job)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({'status': 'ok', 'pending_jobs': job_store.pending()})
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5001, threaded=True, debug=True)
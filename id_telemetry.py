@@ -0,0 +1,217 @@
+"""
+Per-submission timing spans and counters for the ID card intake, written as
+one JSON object per line to a size-rotated local log.
+
+    telemetry = TelemetryLog('logs/id_intake.jsonl')
+    trace = telemetry.start('extract', card_type='list')
+    with trace.span('ocr'):
+        result = backend.analyze(img_bytes)
+    trace.finish()
+
+While a trace is open it is the current trace of its thread, so library code
+(ocr_cache, ocr_backends) adds its own spans and counters with the module level
+span() / count() without having the trace passed in; they do nothing otherwise.
+
+Summarize a log into percentiles per span:
+
+    python id_telemetry.py logs/id_intake.jsonl
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from latency_stats import percentile
+
+DEFAULT_PATH = os.path.join('logs', 'id_intake.jsonl')
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+
+_local = threading.local()
+
+
+class Trace:
+    """Spans (milliseconds, summed per name) and counters of one extraction or submission."""
+
+    def __init__(self, log, kind, **attributes):
+        self.log = log
+        self.record = {
+            'ts': datetime.now().isoformat(timespec='milliseconds'),
+            'trace_id': uuid.uuid4().hex[:12],
+            'kind': kind,
+            **attributes,
+        }
+        self.spans = {}
+        self.counters = {}
+        self.finished = False
+        self._start = time.perf_counter()
+        # Traces do not nest; a new one replaces any left open by an interrupted script run
+        _local.trace = self
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.record.setdefault('failed_span', name)
+            raise
+        finally:
+            self.spans[name] = self.spans.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, **attributes):
+        self.record.update(attributes)
+
+    def finish(self, error=None):
+        """Write the record; the first call wins, so it is safe in both `except` and `finally`."""
+        if self.finished:
+            return
+        self.finished = True
+        if getattr(_local, 'trace', None) is self:
+            _local.trace = None
+        self.record['total_ms'] = round((time.perf_counter() - self._start) * 1000, 3)
+        self.record['spans'] = {name: round(ms, 3) for name, ms in self.spans.items()}
+        self.record['counters'] = self.counters
+        self.record['outcome'] = 'ok' if error is None else 'error'
+        if error is not None:
+            self.record['error'] = f"{type(error).__name__}: {error}"[:300]
+        self.log.write(self.record)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(exc)
+
+
+class TelemetryLog:
+    """
+    Args:
+        path (str): JSONL file; rotated to path.1 .. path.<backup_count> past max_bytes.
+        max_bytes (int): Size at which the file is rotated.
+        backup_count (int): Rotated files kept.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # One logger per file; logging handles the locking and the rotation
+        self._logger = logging.getLogger(f'id_telemetry.{os.path.abspath(path)}')
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        if not self._logger.handlers:
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self._logger.addHandler(handler)
+
+    def start(self, kind, **attributes):
+        """Open a trace and make it the current one of this thread until finish()."""
+        return Trace(self, kind, **attributes)
+
+    def write(self, record):
+        self._logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+
+def span(name):
+    """Time a block into the current trace, if there is one."""
+    trace = current_trace()
+    return trace.span(name) if trace is not None else nullcontext()
+
+
+def count(name, amount=1):
+    """Add to a counter of the current trace, if there is one."""
+    trace = current_trace()
+    if trace is not None:
+        trace.count(name, amount)
+
+
+# ----------------- summary
+
+def read_records(path):
+    """Records of `path` and its rotated files, oldest first. Unreadable lines are skipped."""
+    rotated = []
+    i = 1
+    while os.path.exists(f'{path}.{i}'):
+        rotated.append(f'{path}.{i}')
+        i += 1
+    for file_path in list(reversed(rotated)) + [path]:
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def summarize(records, since=None):
+    """
+    Aggregate records per kind: outcome counts, p50/p95/p99/max per span and
+    total_ms, and counter totals.
+    """
+    kinds = {}
+    for record in records:
+        if since and record.get('ts', '') < since:
+            continue
+        kind = kinds.setdefault(record.get('kind', '?'), {'count': 0, 'outcomes': {}, 'spans': {}, 'counters': {}})
+        kind['count'] += 1
+        outcome = record.get('outcome', '?')
+        kind['outcomes'][outcome] = kind['outcomes'].get(outcome, 0) + 1
+        for name, ms in dict(record.get('spans', {}), total=record.get('total_ms', 0.0)).items():
+            kind['spans'].setdefault(name, []).append(ms)
+        for name, value in record.get('counters', {}).items():
+            kind['counters'][name] = kind['counters'].get(name, 0) + value
+
+    for kind in kinds.values():
+        kind['spans'] = {
+            name: {
+                'count': len(values),
+                'p50_ms': percentile(values, 50),
+                'p95_ms': percentile(values, 95),
+                'p99_ms': percentile(values, 99),
+                'max_ms': max(values),
+            }
+            for name, values in kind['spans'].items()
+        }
+    return kinds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the ID intake telemetry log into percentiles")
+    parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+    parser.add_argument('--since', help="Only records at or after this ISO timestamp, e.g. 2025-01-31")
+    parser.add_argument('--json', action='store_true', help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    summary = summarize(read_records(args.path), args.since)
+    if args.json:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+        return
+
+    for kind, stats in sorted(summary.items()):
+        print(f"{kind}: {stats['count']} records {stats['outcomes']}")
+        for name, span_stats in sorted(stats['spans'].items(), key=lambda item: -item[1]['p50_ms']):
+            print(f"  {name:<20} n={span_stats['count']:<6} p50 {span_stats['p50_ms']:9.1f} ms  "
+                  f"p95 {span_stats['p95_ms']:9.1f} ms  p99 {span_stats['p99_ms']:9.1f} ms  "
+                  f"max {span_stats['max_ms']:9.1f} ms")
+        if stats['counters']:
+            print(f"  counters {stats['counters']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import io
+from typing import NamedTuple
+
+from PIL import Image, ImageOps
+
+# Long side that still leaves ID card text comfortably above Azure's minimum
+# character height, and the JPEG quality range used to hit a size budget
+MAX_SIDE = 1600
+QUALITY = 85
+MIN_QUALITY = 60
+MAX_BYTES = 500 * 1024
+
+FORMAT_MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+}
+
+
+class NormalizedImage(NamedTuple):
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    original_size: int
+
+
+def normalize_card_image(img_bytes, max_side=MAX_SIDE, image_format='JPEG', quality=QUALITY,
+                         min_quality=MIN_QUALITY, max_bytes=MAX_BYTES):
+    """
+    Prepare a phone photo of an ID card for OCR and storage: apply the EXIF
+    orientation, downscale so the long side is at most `max_side`, and re-encode
+    as JPEG/WebP, lowering quality step by step (not below `min_quality`) until
+    the result fits in `max_bytes`.
+
+    Args:
+        img_bytes (bytes): The uploaded image.
+        max_side (int): Longest side in pixels after downscaling.
+        image_format (str): 'JPEG' or 'WEBP'.
+        quality (int): Starting encoder quality.
+        min_quality (int): Lowest quality tried when fitting `max_bytes`.
+        max_bytes (int): Size budget; None to encode once at `quality`.
+
+    Returns:
+        NormalizedImage: The encoded bytes and their mime type. An upright JPEG/WebP
+                         original is returned unchanged if re-encoding would not make it smaller.
+    """
+    img = Image.open(io.BytesIO(img_bytes))
+    original_format = img.format
+    orientation = img.getexif().get(0x0112, 1)
+    if original_format == 'JPEG':
+        # Let libjpeg decode at reduced scale when the photo is far larger than needed
+        img.draft('RGB', (max_side, max_side))
+    img = ImageOps.exif_transpose(img)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    encoded = None
+    current_quality = quality
+    while True:
+        buffer = io.BytesIO()
+        img.save(buffer, format=image_format, quality=current_quality, optimize=True)
+        encoded = buffer.getvalue()
+        if max_bytes is None or len(encoded) <= max_bytes or current_quality <= min_quality:
+            break
+        current_quality = max(current_quality - 10, min_quality)
+
+    if len(encoded) >= len(img_bytes) and orientation == 1 and original_format in FORMAT_MIME_TYPES:
+        # Already small and upright: keep the original
+        width, height = Image.open(io.BytesIO(img_bytes)).size
+        return NormalizedImage(img_bytes, FORMAT_MIME_TYPES[original_format], width, height, len(img_bytes))
+
+    return NormalizedImage(encoded, FORMAT_MIME_TYPES[image_format], img.width, img.height, len(img_bytes))
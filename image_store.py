@@ -0,0 +1,175 @@
+"""
+Content-addressed storage for ID card images.
+
+Images are stored once per SHA-256 in Extracted_ID_Image and Extracted_ID rows
+reference them through img_sha256, so a resubmitted card never uploads its
+image again. Large images are streamed into the BLOB in chunks with LOB.write
+rather than bound as one in-memory value.
+
+The table and the Extracted_ID.img_sha256 column must exist before the apps,
+id_service.py, id_queue_worker.py or bulk_ingest.py insert by hash. Create them
+once per database (statements that were already applied are skipped):
+
+    python image_store.py              # print the DDL
+    python image_store.py --migrate    # run it with the [api_credentials] secrets
+"""
+import argparse
+import hashlib
+
+import oracledb
+
+# (check, statement): the statement runs only when the check query finds nothing
+IMAGE_STORE_DDL = [
+    ("SELECT 1 FROM user_tables WHERE table_name = 'EXTRACTED_ID_IMAGE'",
+     """
+    CREATE TABLE Extracted_ID_Image (
+        sha256 CHAR(64) PRIMARY KEY,
+        img BLOB,
+        mime_type VARCHAR2(100),
+        byte_size NUMBER,
+        created DATE DEFAULT SYSDATE
+    )
+    """),
+    ("SELECT 1 FROM user_tab_columns WHERE table_name = 'EXTRACTED_ID' AND column_name = 'IMG_SHA256'",
+     """
+    ALTER TABLE Extracted_ID ADD (
+        img_sha256 CHAR(64) REFERENCES Extracted_ID_Image (sha256)
+    )
+    """),
+]
+
+
+def image_sha256(img_bytes):
+    return hashlib.sha256(img_bytes).hexdigest()
+
+
+def create_image_store_schema(connection):
+    """
+    Migration: create the image table and the Extracted_ID reference column
+    unless they already exist. DDL commits on its own.
+
+    Returns:
+        list: The statements that were run.
+    """
+    applied = []
+    with connection.cursor() as cursor:
+        for check, statement in IMAGE_STORE_DDL:
+            cursor.execute(check)
+            if cursor.fetchone() is None:
+                cursor.execute(statement)
+                applied.append(statement)
+    return applied
+
+
+class OracleImageStore:
+    """
+    Extracted_ID_Image table in Oracle.
+
+    Args:
+        pool: Anything with acquire() returning a python-oracledb connection (see oracle_pool.py).
+        chunk_size (int): Bytes per LOB.write call.
+    """
+
+    def __init__(self, pool, chunk_size=1024 * 1024):
+        self.pool = pool
+        self.chunk_size = chunk_size
+
+    def exists(self, sha256):
+        with self.pool.acquire() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM Extracted_ID_Image WHERE sha256 = :sha256", sha256=sha256)
+                return cursor.fetchone() is not None
+
+    def put(self, img_bytes, mime_type, connection=None):
+        """
+        Store the image unless an identical one is already there.
+
+        Args:
+            connection: Session to work in. The image then belongs to the caller's
+                        transaction and is committed (or rolled back) together with
+                        the Extracted_ID row that references it. Without one a session
+                        is taken from the pool and committed here.
+
+        Returns:
+            str: The SHA-256 hex digest to reference from Extracted_ID.img_sha256.
+        """
+        if connection is not None:
+            return self._put(connection, img_bytes, mime_type)
+        with self.pool.acquire() as connection:
+            sha256 = self._put(connection, img_bytes, mime_type)
+            connection.commit()
+        return sha256
+
+    def _put(self, connection, img_bytes, mime_type):
+        sha256 = image_sha256(img_bytes)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM Extracted_ID_Image WHERE sha256 = :sha256", sha256=sha256)
+            if cursor.fetchone() is not None:
+                return sha256
+
+            lob_var = cursor.var(oracledb.DB_TYPE_BLOB)
+            try:
+                cursor.execute(
+                    """
+                    INSERT INTO Extracted_ID_Image (sha256, img, mime_type, byte_size)
+                    VALUES (:sha256, EMPTY_BLOB(), :mime_type, :byte_size)
+                    RETURNING img INTO :img
+                    """,
+                    sha256=sha256, mime_type=mime_type, byte_size=len(img_bytes), img=lob_var)
+            except oracledb.IntegrityError:
+                # Another session stored the same image in the meantime
+                return sha256
+
+            lob = lob_var.getvalue()[0]
+            view = memoryview(img_bytes)
+            for offset in range(0, len(img_bytes), self.chunk_size):
+                # LOB offsets are 1-based
+                lob.write(bytes(view[offset:offset + self.chunk_size]), offset + 1)
+        return sha256
+
+    def discard_unreferenced(self, sha256s, connection):
+        """
+        Delete images no Extracted_ID row references, e.g. those stored for rows
+        whose insert failed, in the caller's transaction.
+        """
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                """
+                DELETE FROM Extracted_ID_Image
+                WHERE sha256 = :sha256 AND NOT EXISTS (SELECT 1 FROM Extracted_ID WHERE img_sha256 = :sha256)
+                """, [{'sha256': sha256} for sha256 in sha256s])
+
+    def get(self, sha256):
+        with self.pool.acquire() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT img FROM Extracted_ID_Image WHERE sha256 = :sha256", sha256=sha256)
+                row = cursor.fetchone()
+                return row[0].read() if row else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--migrate', action='store_true', help="Apply the DDL to the database")
+    parser.add_argument('--secrets', help="Secrets file (default $SECRETS_PATH or .streamlit/secrets.toml)")
+    args = parser.parse_args()
+
+    if not args.migrate:
+        for _, statement in IMAGE_STORE_DDL:
+            print(statement.strip() + ';\n')
+        return
+
+    from app_secrets import load_secrets
+    from oracle_pool import create_pool, make_dsn
+
+    credentials = load_secrets(args.secrets)["api_credentials"]
+    pool = create_pool(credentials['user'], credentials['pass'], make_dsn(credentials), max_sessions=1)
+    with pool.acquire() as connection:
+        applied = create_image_store_schema(connection)
+    pool.close()
+    for statement in applied:
+        print(statement.strip() + ';\n')
+    print(f"{len(applied)} of {len(IMAGE_STORE_DDL)} statements applied")
+
+
+if __name__ == '__main__':
+    main()
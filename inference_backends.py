@@ -0,0 +1,143 @@
+import os
+import threading
+
+import numpy as np
+
+# Default model file per backend; convert_model.py writes the .tflite/.onnx
+# next to the .h5 it was converted from
+MODEL_EXTENSIONS = {
+    'keras': '.h5',
+    'tflite': '.tflite',
+    'onnxruntime': '.onnx',
+    'random': '.h5',
+}
+
+
+def resolve_model_path(model_path, backend):
+    """Swap the extension of `model_path` for the one `backend` loads."""
+    root, _ = os.path.splitext(model_path)
+    return root + MODEL_EXTENSIONS[backend]
+
+
+class KerasBackend:
+    """Full tf.keras model. TensorFlow is imported when the backend is created."""
+
+    name = 'keras'
+
+    def __init__(self, model_path):
+        from tensorflow.keras.models import load_model
+        self.model_path = model_path
+        self.model = load_model(model_path)
+
+    def predict(self, batch):
+        return self.model.predict(batch, verbose=0)
+
+
+class TFLiteBackend:
+    """
+    TensorFlow Lite interpreter. Uses the small `tflite_runtime` package when it is
+    installed and falls back to `tensorflow.lite`. Handles int8/uint8 quantized
+    models by quantizing the input and dequantizing the output.
+    """
+
+    name = 'tflite'
+
+    def __init__(self, model_path, num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+        self.model_path = model_path
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+        # The interpreter holds mutable tensors, so calls are serialized
+        self._lock = threading.Lock()
+
+    def predict(self, batch):
+        with self._lock:
+            input_index = self.input_detail['index']
+            if tuple(self.interpreter.get_input_details()[0]['shape']) != batch.shape:
+                self.interpreter.resize_tensor_input(input_index, batch.shape)
+                self.interpreter.allocate_tensors()
+                self.output_detail = self.interpreter.get_output_details()[0]
+
+            input_dtype = self.input_detail['dtype']
+            if input_dtype in (np.int8, np.uint8):
+                scale, zero_point = self.input_detail['quantization']
+                batch = np.round(batch / scale + zero_point).astype(input_dtype)
+            self.interpreter.set_tensor(input_index, batch)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self.output_detail['index'])
+
+            if output.dtype in (np.int8, np.uint8):
+                scale, zero_point = self.output_detail['quantization']
+                output = (output.astype(np.float32) - zero_point) * scale
+            return output
+
+
+class OnnxRuntimeBackend:
+    """ONNX model executed by onnxruntime on CPU."""
+
+    name = 'onnxruntime'
+
+    def __init__(self, model_path, num_threads=None):
+        import onnxruntime as ort
+        self.model_path = model_path
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self.input_name: batch.astype(np.float32)})[0]
+
+
+class RandomBackend:
+    """
+    Randomly initialized stand-in with the real model's input and output shape
+    (224x224x3 -> 5 class probabilities): one dense layer and a softmax. For
+    benchmarks and load tests on machines without the trained .h5; the model
+    file is not read.
+    """
+
+    name = 'random'
+
+    def __init__(self, model_path=None, num_classes=5, seed=0):
+        from preprocessing import IMG_HEIGHT, IMG_WIDTH
+        self.model_path = model_path
+        rng = np.random.default_rng(seed)
+        self.weights = rng.standard_normal((IMG_HEIGHT * IMG_WIDTH * 3, num_classes), dtype=np.float32) * 0.01
+        self.bias = np.zeros(num_classes, dtype=np.float32)
+
+    def predict(self, batch):
+        logits = batch.reshape(len(batch), -1).astype(np.float32) @ self.weights + self.bias
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+BACKENDS = {
+    'keras': KerasBackend,
+    'tflite': TFLiteBackend,
+    'onnxruntime': OnnxRuntimeBackend,
+    'random': RandomBackend,
+}
+
+
+def load_backend(name, model_path):
+    """
+    Create the inference backend `name` ('keras', 'tflite', 'onnxruntime' or 'random').
+
+    Args:
+        name (str): Backend name.
+        model_path (str): Model file; its extension is replaced with the one the backend loads.
+
+    Returns:
+        object: Backend exposing predict(batch) -> np.ndarray of class probabilities.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name](resolve_model_path(model_path, name))
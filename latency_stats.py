@@ -0,0 +1,9 @@
+"""Latency summary helpers shared by id_telemetry.py and the benchmarks."""
+
+
+def percentile(values, q):
+    """Nearest-rank q-th percentile (0-100) of `values`, 0.0 when empty."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(int(round(q / 100 * (len(ordered) - 1))), len(ordered) - 1)]
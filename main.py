@@ -1,155 +1,26 @@
-import cx_Oracle
-import mimetypes
 from datetime import datetime,date
-from azure.ai.formrecognizer import FormRecognizerClient , DocumentAnalysisClient
-from azure.core.credentials import AzureKeyCredential
-import numpy as np
-import re
 import streamlit as st
-from sqlalchemy import create_engine, text
-from sqlalchemy.exc import SQLAlchemyError
-import urllib.parse
-
-# Access secrets
-endpoint = st.secrets["api_credentials"]["endpoint"]
-api_key = st.secrets["api_credentials"]["api_key"]
-
-document_analysis_client = DocumentAnalysisClient(endpoint=endpoint, credential=AzureKeyCredential(api_key))
-
-
-# helpers
-
-def has_arabic_with_diacritics(text):
-    """
-    Check if text contains Arabic letters with diacritical marks (تشكيل).
-    Args:
-        text (str): The text to check
-    Returns:
-        bool: True if text contains Arabic letters with diacritics, False otherwise
-    """
-    # Arabic diacritical marks (تشكيل)
-    arabic_diacritics = [
-        '\u064B',  # Fathatan
-        '\u064C',  # Dammatan
-        '\u064D',  # Kasratan
-        '\u064E',  # Fatha
-        '\u064F',  # Damma
-        '\u0650',  # Kasra
-        '\u0651',  # Shadda
-        '\u0652',  # Sukun
-    ]
-
-    # Arabic letter range
-    arabic_letter_start = '\u0621'  # ء
-    arabic_letter_end = '\u064A'  # ي
-
-    has_arabic = False
-    has_diacritics = False
-
-    for char in text:
-        # Check if character is an Arabic letter
-        if arabic_letter_start <= char <= arabic_letter_end:
-            has_arabic = True
-        # Check if character is a diacritical mark
-        if char in arabic_diacritics:
-            has_diacritics = True
-
-        # If we found both Arabic letters and diacritics, we can return True
-        if has_arabic and has_diacritics:
-            return True
-
-    return False
-
-
-# Example usage
-# test_cases = [
-#     "مرحبا",  # Arabic without diacritics
-#     "مَرْحَبًا",  # Arabic with diacritics
-#     "Hello world",  # English only
-#     "مرحبا world",  # Mixed without diacritics
-#     "مَرْحَبًا world",  # Mixed with diacritics
-# ]
-
-# for text in test_cases:
-#     result = has_arabic_with_diacritics(text)
-#     print(f"Text: {text}")
-#     print(f"Has Arabic with diacritics: {result}\n")
-
-
-def check_text_type_with_len(text):
-    """
-    Check the type of text based on Arabic/English characters and numbers, and return the length of the text.
-
-    Args:
-        text (str): The input string to check.
-
-    Returns:
-        tuple: A tuple containing the type of text ("ara", "ara_num", "eng_num", "eng_mix", "ara_mix", or "unknown")
-               and the length of the text.
-    """
-    # Define regex patterns
-    arabic_char_pattern = re.compile(r'[\u0600-\u06FF\u0750-\u077F]+')  # Arabic characters
-    arabic_num_pattern = re.compile(r'[\u0660-\u0669]+')  # Arabic numbers (٠-٩)
-    english_num_pattern = re.compile(r'[0-9]+')  # English numbers (0-9)
-    english_char_pattern = re.compile(r'[A-Za-z]+')  # English letters
-
-    # Remove spaces from the text for classification
-    text = text.replace(" ", "")
-
-    # Check for Arabic characters
-    has_arabic_chars = bool(arabic_char_pattern.search(text))
-    # Check for Arabic numbers
-    has_arabic_nums = bool(arabic_num_pattern.search(text))
-    # Check for English numbers
-    has_english_nums = bool(english_num_pattern.search(text))
-    # Check for English characters
-    has_english_chars = bool(english_char_pattern.search(text))
-
-    # Determine the type of text
-    if has_arabic_chars and has_arabic_nums:
-        text_type = "ara_mix"  # Mixed Arabic characters and numbers
-    elif has_arabic_chars:
-        text_type = "ara"  # Arabic characters only
-    elif has_arabic_nums:
-        text_type = "ara_num"  # Arabic numbers only
-    elif has_english_nums and has_english_chars:
-        text_type = "eng_mix"  # Mixed English characters and numbers
-    elif has_english_nums:
-        text_type = "eng_num"  # English numbers only
-    elif has_english_chars:
-        text_type = "eng"  # English characters only
-    else:
-        text_type = "unknown"  # Unknown or other characters
-
-    # Return the text type and the length of the text
-    return text_type, len(text)
-
-
-def sort_ocr_lines(lines):
-    # Sort lines using their top coordinate
-    def get_top_coordinate(line):
-        try:
-            # Try different potential attributes for getting position
-            if hasattr(line, 'polygon'):
-                return line.polygon[1].y  # If polygon is available
-            elif hasattr(line, 'boundingBox'):
-                return line.boundingBox[1]  # Alternative attribute name
-            elif hasattr(line, 'bbox'):
-                return line.bbox[1]  # Another possible attribute
-            else:
-                # If no position attribute is found, use index as fallback
-                return lines.index(line)
-        except Exception as e:
-            print(f"Error sorting line: {e}")
-            return lines.index(line)
-
-    # Sort lines based on top coordinate
-    return sorted(lines, key=get_top_coordinate)
-
-# Function to guess MIME type based on file extension
-def get_mime_type(file_name):
-    mime_type, _ = mimetypes.guess_type(file_name)
-    return mime_type or "application/octet-stream"  # Default MIME type if unknown
+import oracledb
+
+from id_extraction import INSERT_EXTRACTED_ID_BY_HASH_SQL, get_mime_type, new_extracted_info, process_ocr_lines
+from image_store import OracleImageStore
+from ocr_backends import create_ocr_backend
+from oracle_pool import create_pool_from_credentials
+
+
+# Azure unless [ocr] secrets select another backend (see ocr_backends.py)
+@st.cache_resource
+def get_ocr_backend():
+    return create_ocr_backend(st.secrets.get("api_credentials", {}), st.secrets.get("ocr", {}))
+
+
+# One pool per process, shared by every Streamlit session and rerun (see oracle_pool.py)
+@st.cache_resource
+def get_pool():
+    return create_pool_from_credentials(st.secrets["api_credentials"])
+
+
+# helpers (shared ones live in id_extraction.py)
 
 def extract_birthday(id_number):
 
@@ -200,55 +71,6 @@ st.write('Upload an Egyptian ID card image to extract information')
 file_upload = st.file_uploader("Upload the Picture" , type=["jpg", "jpeg", "png", "gif"])
 flag_upload = False
 
-extracted_info = {
-    'id': None,
-    'factory_num': None,
-    'first_name': None,
-    'second_name': None,
-    'address': None,
-    'address2': None
-}
-
-
-# Function to process OCR lines and extract information
-def process_ocr_lines(layout_result):
-    sorted_page_lines = sort_ocr_lines(layout_result.pages[0].lines)
-
-    for line in sorted_page_lines:
-        result = has_arabic_with_diacritics(line.content)
-        text_type, len_text = check_text_type_with_len(line.content)
-
-        # Skip unwanted lines
-        if result or ('بطاقة' in line.content) or ('الشخصية' in line.content) or ('/' in line.content):
-            continue
-
-        # Extract information logic
-        if not st.session_state.extracted_info['id'] and text_type == 'ara_mix' and len_text == 14:
-            st.session_state.extracted_info['id'] = line.content
-
-        elif not st.session_state.extracted_info['factory_num'] and text_type == 'eng_mix' and len_text > 5:
-            st.session_state.extracted_info['factory_num'] = line.content
-
-        elif not st.session_state.extracted_info['first_name'] and text_type == 'ara' and len_text < 10:
-            st.session_state.extracted_info['first_name'] = line.content
-
-        elif not st.session_state.extracted_info['second_name'] and text_type == 'ara' and len_text > 9:
-            st.session_state.extracted_info['second_name'] = line.content
-
-        elif not st.session_state.extracted_info['address'] and (
-                text_type == 'ara_mix' or text_type == 'ara') and len_text >= 5:
-            st.session_state.extracted_info['address'] = line.content
-
-        elif not st.session_state.extracted_info['address2'] and (
-                text_type == 'ara_mix' or text_type == 'ara') and len_text >= 5:
-            st.session_state.extracted_info['address2'] = line.content
-
-        # Break if all information is extracted
-        if all(st.session_state.extracted_info.values()):
-            break
-
-
-
 type = ["list", "OTM-PROJECT"]
 
 # Display the list in a select box
@@ -271,21 +93,13 @@ if file_upload:
     img_bytes =file_upload.getvalue()
     print("mime_type",mime_type,"\nlast_update_date",last_update_date)
     # Reset session state when a new image is uploaded
-    st.session_state.extracted_info = {
-        'id': None,
-        'factory_num': None,
-        'first_name': None,
-        'second_name': None,
-        'address': None,
-        'address2': None
-    }
+    st.session_state.extracted_info = new_extracted_info()
 
     # Analyze the document
-    poller = document_analysis_client.begin_analyze_document("prebuilt-layout", img)
-    layout_result = poller.result()
+    layout_result = get_ocr_backend().analyze(img_bytes)
 
     # Process OCR lines
-    process_ocr_lines(layout_result)
+    process_ocr_lines(layout_result, st.session_state.extracted_info)
 
     # Always show extracted data initially
     st.subheader("Extracted Information")
@@ -338,45 +152,13 @@ else:st.write("Please upload an image file")
 
 if st.button("Submit") and file_upload:
     try:
-        # Create connection string
-        username = st.secrets["api_credentials"]['user']
-        password = urllib.parse.quote_plus(st.secrets["api_credentials"]['pass'])
-        host = st.secrets["api_credentials"]['host']
-        port = st.secrets["api_credentials"]['port']
-        service_name = st.secrets["api_credentials"]['sn']
-
-        connection_string = f"oracle+cx_oracle://{username}:{password}@{host}:{port}/{service_name}"
-        
-        # Create SQLAlchemy engine
-        engine = create_engine(connection_string)
-
-        # SQL query to create the table (if not exists)
-        create_table_query = """
-        CREATE TABLE IF NOT EXISTS Extracted_ID (
-            id NUMBER PRIMARY KEY,
-            name VARCHAR2(100),
-            address VARCHAR2(200),
-            date_column DATE,
-            stamp TIMESTAMP,
-            img BLOB,
-            mime_type VARCHAR2(100),
-            last_update_img DATE,
-            created_by VARCHAR2(50),
-            type VARCHAR2(50),
-            P_id NUMBER
-        )
-        """
-
-        # SQL statement to insert data
-        sql_stat = """
-        INSERT INTO Extracted_ID (
-            id, P_id, name, address, date_column, stamp, 
-            img, mime_type, last_update_img, created_by, type
-        ) VALUES (
-            extracted_id_seq.NEXTVAL, :p_id, :name, :address, :date_column, :stamp, 
-            :img, :mime_type, :last_update_img, :created_by, :type
-        )
-        """
+        # Sessions come from the process-wide pool (see oracle_pool.py)
+        connection = get_pool().acquire()
+        cursor = connection.cursor()
+
+        # The image goes to the content-addressed store once; the row only references its hash.
+        # Both are written on this session and committed together
+        img_sha256 = OracleImageStore(get_pool()).put(img_bytes, mime_type, connection=connection)
 
         # Prepare data for insertion
         data = {
@@ -384,25 +166,22 @@ if st.button("Submit") and file_upload:
             'name': name or '',
             'address': address or '',
             'date_column': datetime.strptime(birthday, "%Y-%m-%d"),
-            'stamp': current_time,
-            'img': img_bytes,
+            'stamp': datetime.combine(current_date, current_time),
+            'img_sha256': img_sha256,
             'mime_type': mime_type,
             'last_update_img': current_date,
             'created_by': ' ',
-            'type': selected_item
+            'type': selected_item,
+            'factory_num': st.session_state.extracted_info['factory_num']
         }
 
-        # Execute queries
-        with engine.connect() as connection:
-            # Optionally create table
-            connection.execute(text(create_table_query))
-            
-            # Insert data
-            connection.execute(text(sql_stat), data)
-            
-            st.success("Data inserted successfully!")
-
-    except SQLAlchemyError as e:
+        # Insert data
+        cursor.execute(INSERT_EXTRACTED_ID_BY_HASH_SQL, data)
+        connection.commit()
+
+        st.success("Data inserted successfully!")
+
+    except oracledb.DatabaseError as e:
         st.error(f"Database error: {e}")
 
     finally:
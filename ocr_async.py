@@ -0,0 +1,106 @@
+import asyncio
+
+from azure.ai.formrecognizer.aio import DocumentAnalysisClient
+from azure.core.credentials import AzureKeyCredential
+
+
+class AsyncExtractionService:
+    """
+    Run many Azure document analyses concurrently instead of blocking on one poller at a time.
+
+    Use as an async context manager so the underlying client session is closed:
+
+        async with AsyncExtractionService(endpoint, api_key, max_concurrency=8) as service:
+            results = await service.analyze_many([img1_bytes, img2_bytes])
+
+    Args:
+        endpoint (str): Form Recognizer / Document Intelligence endpoint.
+        api_key (str): Resource key.
+        model_id (str): Analysis model, e.g. "prebuilt-document" or "prebuilt-layout".
+        max_concurrency (int): Upper bound on analyses in flight at once.
+    """
+
+    def __init__(self, endpoint, api_key, model_id="prebuilt-document", max_concurrency=8):
+        self.model_id = model_id
+        self.max_concurrency = max_concurrency
+        self._client = DocumentAnalysisClient(endpoint=endpoint, credential=AzureKeyCredential(api_key))
+        self._semaphore = None
+
+    async def __aenter__(self):
+        await self._client.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client.__aexit__(*exc_info)
+
+    async def close(self):
+        await self._client.close()
+
+    def _get_semaphore(self):
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def analyze(self, document, **kwargs):
+        """
+        Analyze one document (bytes or a binary file-like object).
+
+        Returns:
+            AnalyzeResult: Same result object the blocking client returns from poller.result().
+        """
+        async with self._get_semaphore():
+            poller = await self._client.begin_analyze_document(self.model_id, document, **kwargs)
+            return await poller.result()
+
+    def submit(self, document, callback=None, **kwargs):
+        """
+        Schedule an analysis on the running loop and return the asyncio.Task.
+        If given, callback(result, error) is called when it finishes.
+        """
+        task = asyncio.ensure_future(self.analyze(document, **kwargs))
+        if callback is not None:
+            def _done(finished):
+                if finished.cancelled():
+                    return
+                error = finished.exception()
+                callback(None if error else finished.result(), error)
+            task.add_done_callback(_done)
+        return task
+
+    async def analyze_many(self, documents, callback=None, **kwargs):
+        """
+        Analyze all `documents` with at most `max_concurrency` in flight.
+
+        Args:
+            documents (list): Document bytes or file-like objects.
+            callback (callable): Optional callback(index, result, error) called as each one finishes.
+
+        Returns:
+            list: One entry per document, in input order: the AnalyzeResult or the exception raised.
+        """
+        async def _run(index, document):
+            try:
+                result = await self.analyze(document, **kwargs)
+            except Exception as e:
+                if callback is not None:
+                    callback(index, None, e)
+                return e
+            if callback is not None:
+                callback(index, result, None)
+            return result
+
+        return await asyncio.gather(*(_run(i, document) for i, document in enumerate(documents)))
+
+
+def analyze_documents(endpoint, api_key, documents, model_id="prebuilt-document", max_concurrency=8, callback=None,
+                      **kwargs):
+    """
+    Blocking wrapper around AsyncExtractionService.analyze_many for scripts and batch jobs.
+    Extra keyword arguments (e.g. pages="1") go to begin_analyze_document.
+    """
+    async def _main():
+        async with AsyncExtractionService(endpoint, api_key, model_id, max_concurrency) as service:
+            return await service.analyze_many(documents, callback=callback, **kwargs)
+
+    return asyncio.run(_main())
@@ -0,0 +1,334 @@
+"""
+OCR backends for ID card extraction.
+
+Every backend has analyze(image_bytes) returning an object with
+pages[0].lines, each line having .content and .polygon points with .x/.y,
+which is all extract_id_fields / process_ocr_lines read.
+
+- AzureOcrBackend: Azure Document Intelligence (optionally with an ocr_cache).
+- ReplayOcrBackend: recorded results from JSON fixtures, matched to the image
+  they were recorded from by SHA-256. Offline tests and load tests without
+  spending quota; RecordingOcrBackend records them from live calls.
+- TesseractOcrBackend: local Tesseract with the Arabic language pack (pytesseract).
+- FallbackOcrBackend: primary backend, switching to another one when Azure
+  reports the quota is exhausted or throttles.
+
+create_ocr_services builds the backend, its ocr_cache and the telemetry log
+from the apps' secrets, for the Streamlit app, id_service.py and id_queue_worker.py.
+"""
+import hashlib
+import io
+import json
+import os
+from typing import NamedTuple
+
+from id_extraction import OcrLine, Point
+from id_telemetry import TelemetryLog, count
+from ocr_profiles import get_profile
+
+QUOTA_ERROR_PREFIX = "(403) Out of call volume quota"
+
+# Recorded cards: card_01.json (the AnalyzeResult) next to card_01.jpg (the image)
+FIXTURES_DIR = os.path.join('benchmarks', 'fixtures', 'id_cards')
+FIXTURE_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+
+class OcrPage(NamedTuple):
+    lines: list
+
+
+class OcrResult(NamedTuple):
+    """Lightweight stand-in for AnalyzeResult with just what the extractor needs."""
+    pages: list
+
+
+class OcrServices(NamedTuple):
+    backend: object
+    cache: object
+    telemetry: TelemetryLog
+
+
+class OcrBackendError(Exception):
+    pass
+
+
+def is_quota_error(error):
+    """True for Azure quota exhaustion (403 on the F0 tier) and throttling (429)."""
+    status_code = getattr(error, 'status_code', None)
+    return status_code == 429 or str(error).startswith(QUOTA_ERROR_PREFIX) or (
+        status_code == 403 and 'quota' in str(error).lower())
+
+
+def is_transient_ocr_error(error):
+    """Quota/throttling, Azure 5xx and network errors: worth retrying later with backoff."""
+    if is_quota_error(error):
+        return True
+    if getattr(error, 'status_code', None) in (500, 502, 503, 504):
+        return True
+    # azure.core.exceptions.ServiceRequestError / ServiceResponseError, without importing azure
+    return type(error).__name__ in ('ServiceRequestError', 'ServiceResponseError') or isinstance(
+        error, (ConnectionError, TimeoutError))
+
+
+def result_from_dict(data):
+    """Build an OcrResult from AnalyzeResult.to_dict() output (or the same shape hand-written)."""
+    pages = []
+    for page in data.get('pages', []):
+        lines = [
+            OcrLine(line['content'], tuple(Point(point['x'], point['y']) for point in line.get('polygon') or []))
+            for line in page.get('lines', [])
+        ]
+        pages.append(OcrPage(lines))
+    return OcrResult(pages)
+
+
+def result_to_dict(result):
+    """The JSON shape result_from_dict reads, from an AnalyzeResult or an OcrResult."""
+    if hasattr(result, 'to_dict'):
+        return result.to_dict()
+    return {'pages': [
+        {'lines': [{'content': line.content, 'polygon': [{'x': point.x, 'y': point.y} for point in line.polygon]}
+                   for line in page.lines]}
+        for page in result.pages
+    ]}
+
+
+class AzureOcrBackend:
+    """
+    Args:
+        client: azure.ai.formrecognizer.DocumentAnalysisClient.
+        profile (str): Analysis profile name (see ocr_profiles.py).
+        cache: Optional ocr_cache backend.
+        rate_limiter: Optional work_queue.TokenBucket; every call that misses the cache takes a token.
+    """
+
+    name = 'azure'
+
+    def __init__(self, client, profile=None, cache=None, rate_limiter=None):
+        self.client = client
+        self.profile = get_profile(profile)
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+
+    @classmethod
+    def from_credentials(cls, endpoint, api_key, profile=None, cache=None, rate_limiter=None):
+        from azure.ai.formrecognizer import DocumentAnalysisClient
+        from azure.core.credentials import AzureKeyCredential
+        return cls(DocumentAnalysisClient(endpoint=endpoint, credential=AzureKeyCredential(api_key)), profile, cache,
+                   rate_limiter)
+
+    def analyze(self, image_bytes):
+        from ocr_cache import analyze_with_cache
+        try:
+            return analyze_with_cache(self.client, self.profile.model_id, image_bytes, self.cache,
+                                      self.rate_limiter, **self.profile.analyze_kwargs())
+        except Exception as e:
+            if is_quota_error(e):
+                count('quota_errors')
+            raise
+
+
+class ReplayOcrBackend:
+    """
+    Replay recorded results. A fixture is <name>.json in `fixtures_dir` next to
+    the image it was recorded from (<name>.jpg, .png, ...); an analyzed image is
+    matched to the fixture whose image has the same SHA-256. record() writes
+    such pairs. `default_fixture` (a file name in the folder) is returned for
+    unknown images when given, which is what load tests with arbitrary images want.
+    """
+
+    name = 'replay'
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR, default_fixture=None):
+        self.fixtures_dir = fixtures_dir
+        self.default_fixture = default_fixture
+        self._loaded = {}
+        self._index = None
+
+    def _load(self, path):
+        if path not in self._loaded:
+            with open(path, encoding='utf-8') as f:
+                self._loaded[path] = result_from_dict(json.load(f))
+        return self._loaded[path]
+
+    def _fixture_index(self):
+        # SHA-256 of each recorded image -> its fixture, built on first use
+        if self._index is None:
+            index = {}
+            names = sorted(os.listdir(self.fixtures_dir)) if os.path.isdir(self.fixtures_dir) else []
+            for name in names:
+                stem, extension = os.path.splitext(name)
+                fixture_path = os.path.join(self.fixtures_dir, stem + '.json')
+                if extension.lower() in FIXTURE_IMAGE_EXTENSIONS and os.path.exists(fixture_path):
+                    with open(os.path.join(self.fixtures_dir, name), 'rb') as f:
+                        index[hashlib.sha256(f.read()).hexdigest()] = fixture_path
+            self._index = index
+        return self._index
+
+    def analyze(self, image_bytes):
+        sha256 = hashlib.sha256(image_bytes).hexdigest()
+        path = self._fixture_index().get(sha256)
+        if path is not None:
+            return self._load(path)
+        if self.default_fixture:
+            return self._load(os.path.join(self.fixtures_dir, self.default_fixture))
+        raise OcrBackendError(f"No recorded OCR fixture for image {sha256}")
+
+    def record(self, image_bytes, result, name=None):
+        """
+        Save `result` (an AnalyzeResult or OcrResult) and the image as the fixture
+        <name>.json / <name>.<image format>; `name` defaults to the start of the image SHA-256.
+        """
+        from PIL import Image
+
+        sha256 = hashlib.sha256(image_bytes).hexdigest()
+        name = name or sha256[:16]
+        image_format = Image.open(io.BytesIO(image_bytes)).format or 'JPEG'
+        extension = '.jpg' if image_format == 'JPEG' else '.' + image_format.lower()
+        os.makedirs(self.fixtures_dir, exist_ok=True)
+        with open(os.path.join(self.fixtures_dir, name + extension), 'wb') as f:
+            f.write(image_bytes)
+        path = os.path.join(self.fixtures_dir, name + '.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(result_to_dict(result), f, ensure_ascii=False, indent=1)
+        self._fixture_index()[sha256] = path
+        return path
+
+
+class RecordingOcrBackend:
+    """Pass calls through to `backend` and record every result as a replay fixture."""
+
+    name = 'recording'
+
+    def __init__(self, backend, replay):
+        self.backend = backend
+        self.replay = replay
+
+    def analyze(self, image_bytes):
+        result = self.backend.analyze(image_bytes)
+        self.replay.record(image_bytes, result)
+        return result
+
+
+class TesseractOcrBackend:
+    """
+    Local OCR with Tesseract. Needs the tesseract binary with the `ara` traineddata
+    and the pytesseract package. Words are grouped into lines the way Tesseract
+    segments them; each line polygon is its bounding box (top-left clockwise).
+    """
+
+    name = 'tesseract'
+
+    def __init__(self, lang='ara+eng', config='--psm 6'):
+        import pytesseract
+        self.pytesseract = pytesseract
+        self.lang = lang
+        self.config = config
+
+    def analyze(self, image_bytes):
+        from PIL import Image
+
+        image = Image.open(io.BytesIO(image_bytes))
+        data = self.pytesseract.image_to_data(image, lang=self.lang, config=self.config,
+                                              output_type=self.pytesseract.Output.DICT)
+        grouped = {}
+        for i, text in enumerate(data['text']):
+            if not text.strip():
+                continue
+            key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            left, top = data['left'][i], data['top'][i]
+            right, bottom = left + data['width'][i], top + data['height'][i]
+            words, box = grouped.setdefault(key, ([], [left, top, right, bottom]))
+            words.append(text)
+            box[0], box[1] = min(box[0], left), min(box[1], top)
+            box[2], box[3] = max(box[2], right), max(box[3], bottom)
+
+        lines = []
+        for words, (left, top, right, bottom) in grouped.values():
+            polygon = (Point(left, top), Point(right, top), Point(right, bottom), Point(left, bottom))
+            lines.append(OcrLine(' '.join(words), polygon))
+        return OcrResult([OcrPage(lines)])
+
+
+class FallbackOcrBackend:
+    """Use `primary`; when it fails with a quota/throttling error use `fallback` instead."""
+
+    name = 'fallback'
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+
+    def analyze(self, image_bytes):
+        try:
+            return self.primary.analyze(image_bytes)
+        except Exception as e:
+            if not is_quota_error(e):
+                raise
+            print(f"{self.primary.name} quota exhausted, using {self.fallback.name}: {e}")
+            count('ocr_fallbacks')
+            return self.fallback.analyze(image_bytes)
+
+
+def create_ocr_backend(credentials, settings=None, cache=None, rate_limiter=None):
+    """
+    Build the backend described by the [ocr] settings:
+
+        backend = "azure" | "replay" | "tesseract"   (default "azure")
+        profile = "read" | "layout" | "document"      (azure only)
+        fixtures_dir, default_fixture                   (replay only)
+        lang                                            (tesseract only)
+        fallback = "replay" | "tesseract"               (used when Azure quota runs out)
+        record_dir                                      (save every result as a replay fixture there)
+    """
+    settings = dict(settings or {})
+
+    def build(name):
+        if name == 'azure':
+            return AzureOcrBackend.from_credentials(credentials['endpoint'], credentials['api_key'],
+                                                    settings.get('profile'), cache, rate_limiter)
+        if name == 'replay':
+            return ReplayOcrBackend(settings.get('fixtures_dir', FIXTURES_DIR), settings.get('default_fixture'))
+        if name == 'tesseract':
+            return TesseractOcrBackend(settings.get('lang', 'ara+eng'))
+        raise ValueError(f"Unknown OCR backend '{name}'")
+
+    backend = build(settings.get('backend', 'azure'))
+    if settings.get('fallback'):
+        backend = FallbackOcrBackend(backend, build(settings['fallback']))
+    if settings.get('record_dir'):
+        backend = RecordingOcrBackend(backend, ReplayOcrBackend(settings['record_dir']))
+    return backend
+
+
+def create_ocr_services(secrets, rate_limiter=None):
+    """
+    Build the OCR backend, its result cache and the telemetry log from the apps'
+    secrets (st.secrets or a parsed .streamlit/secrets.toml):
+
+        [api_credentials]  endpoint, api_key
+        [ocr]              see create_ocr_backend
+        [ocr_cache]        backend = "sqlite" | "directory", path, ttl_seconds, max_entries
+        [telemetry]        path, max_bytes, backup_count
+
+    Args:
+        rate_limiter: Optional work_queue.TokenBucket Azure calls that miss the cache take a token from.
+
+    Returns:
+        OcrServices: (backend, cache, telemetry)
+    """
+    from ocr_cache import OCR_CACHE_BACKENDS
+
+    cache_settings = secrets.get("ocr_cache", {})
+    cache_backend = OCR_CACHE_BACKENDS[cache_settings.get("backend", "sqlite")]
+    cache_kwargs = {key: cache_settings[key] for key in ("ttl_seconds", "max_entries") if key in cache_settings}
+    # SQLiteOcrCache takes a path and DirectoryOcrCache a root, both first
+    cache = (cache_backend(cache_settings["path"], **cache_kwargs) if "path" in cache_settings
+             else cache_backend(**cache_kwargs))
+
+    backend = create_ocr_backend(secrets.get("api_credentials", {}), secrets.get("ocr", {}), cache, rate_limiter)
+
+    telemetry_settings = secrets.get("telemetry", {})
+    telemetry = TelemetryLog(**{key: telemetry_settings[key] for key in ("path", "max_bytes", "backup_count")
+                                if key in telemetry_settings})
+    return OcrServices(backend, cache, telemetry)
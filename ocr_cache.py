@@ -0,0 +1,173 @@
+"""
+Persistent cache of Azure analysis results keyed by image hash and model id.
+
+Streamlit reruns (Edit / Save / Cancel clicks) and re-uploads of the same card
+then cost no Form Recognizer quota and no network round trip. Two backends share
+one interface: SQLiteOcrCache (default) and DirectoryOcrCache (one JSON file per entry).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from id_telemetry import count, span
+
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 10000
+
+
+def ocr_cache_key(image_bytes, model_id):
+    digest = hashlib.sha256()
+    digest.update(model_id.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(image_bytes)
+    return digest.hexdigest()
+
+
+def serialize_result(result):
+    return json.dumps(result.to_dict(), ensure_ascii=False)
+
+
+def deserialize_result(payload):
+    from azure.ai.formrecognizer import AnalyzeResult
+    return AnalyzeResult.from_dict(json.loads(payload))
+
+
+class SQLiteOcrCache:
+    """
+    Args:
+        path (str): SQLite database file.
+        ttl_seconds (float): Entries older than this are misses. 0 = never expire.
+        max_entries (int): Least recently used entries are evicted past this count.
+    """
+
+    def __init__(self, path='.ocr_cache.sqlite', ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ocr_cache (
+                    key TEXT PRIMARY KEY,
+                    model_id TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    payload TEXT NOT NULL
+                )
+                """)
+            self._connection.execute("CREATE INDEX IF NOT EXISTS ocr_cache_last_access ON ocr_cache (last_access)")
+
+    def get(self, image_bytes, model_id):
+        key = ocr_cache_key(image_bytes, model_id)
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute("SELECT created, payload FROM ocr_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            created, payload = row
+            if self.ttl_seconds and now - created > self.ttl_seconds:
+                self._connection.execute("DELETE FROM ocr_cache WHERE key = ?", (key,))
+                return None
+            self._connection.execute("UPDATE ocr_cache SET last_access = ? WHERE key = ?", (now, key))
+        return deserialize_result(payload)
+
+    def put(self, image_bytes, model_id, result):
+        key = ocr_cache_key(image_bytes, model_id)
+        payload = serialize_result(result)
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO ocr_cache (key, model_id, created, last_access, payload) VALUES (?, ?, ?, ?, ?)",
+                (key, model_id, now, now, payload))
+            if self.ttl_seconds:
+                self._connection.execute("DELETE FROM ocr_cache WHERE created < ?", (now - self.ttl_seconds,))
+            self._connection.execute(
+                """
+                DELETE FROM ocr_cache WHERE key IN (
+                    SELECT key FROM ocr_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+                """, (self.max_entries,))
+
+
+class DirectoryOcrCache:
+    """Same interface storing <root>/<key>.json files; age is the file mtime and the oldest files are evicted first."""
+
+    def __init__(self, root='.ocr_cache', ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, key + '.json')
+
+    def get(self, image_bytes, model_id):
+        path = self._path(ocr_cache_key(image_bytes, model_id))
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if self.ttl_seconds and age > self.ttl_seconds:
+                os.remove(path)
+                return None
+            with open(path, encoding='utf-8') as f:
+                return deserialize_result(f.read())
+        except OSError:
+            return None
+
+    def put(self, image_bytes, model_id, result):
+        path = self._path(ocr_cache_key(image_bytes, model_id))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(serialize_result(result))
+        os.replace(tmp_path, path)
+
+        entries = sorted(
+            (entry.stat().st_mtime, entry.path) for entry in os.scandir(self.root) if entry.name.endswith('.json'))
+        for _, old_path in entries[:max(len(entries) - self.max_entries, 0)]:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+
+OCR_CACHE_BACKENDS = {
+    'sqlite': SQLiteOcrCache,
+    'directory': DirectoryOcrCache,
+}
+
+
+def analyze_with_cache(client, model_id, image_bytes, cache=None, rate_limiter=None, **kwargs):
+    """
+    client.begin_analyze_document(model_id, image_bytes, **kwargs).result(), served from
+    `cache` when the same image was already analyzed with the same model and options.
+    Only a cache miss takes a token from `rate_limiter` (work_queue.TokenBucket).
+    """
+    # Options such as pages="1" change the result, so they are part of the key
+    cache_model_id = model_id
+    if kwargs:
+        cache_model_id += json.dumps(kwargs, sort_keys=True)
+
+    if cache is not None:
+        with span('ocr_cache_get'):
+            cached = cache.get(image_bytes, cache_model_id)
+        if cached is not None:
+            count('ocr_cache_hits')
+            return cached
+
+    if rate_limiter is not None:
+        with span('ocr_rate_limit'):
+            rate_limiter.acquire()
+
+    # Submitting the document and waiting for the poller are timed apart
+    with span('ocr_begin'):
+        poller = client.begin_analyze_document(model_id, image_bytes, **kwargs)
+    with span('ocr_result'):
+        result = poller.result()
+    count('ocr_calls')
+    if cache is not None:
+        cache.put(image_bytes, cache_model_id, result)
+    return result
@@ -0,0 +1,36 @@
+"""
+Azure analysis profiles for ID card OCR.
+
+Field extraction only reads pages[0].lines, which every prebuilt model returns.
+prebuilt-read is the cheapest and fastest of them; prebuilt-layout adds tables and
+selection marks, prebuilt-document adds key-value pairs on top of layout. All
+profiles analyze page 1 only. Compare them with benchmarks/bench_ocr_profiles.py.
+"""
+from typing import NamedTuple
+
+
+class AnalysisProfile(NamedTuple):
+    name: str
+    model_id: str
+    pages: str = "1"
+
+    def analyze_kwargs(self):
+        """Keyword arguments for begin_analyze_document besides the model and document."""
+        return {'pages': self.pages} if self.pages else {}
+
+
+ANALYSIS_PROFILES = {
+    'read': AnalysisProfile('read', 'prebuilt-read'),
+    'layout': AnalysisProfile('layout', 'prebuilt-layout'),
+    'document': AnalysisProfile('document', 'prebuilt-document'),
+}
+
+DEFAULT_PROFILE = 'read'
+
+
+def get_profile(name=None):
+    """Look up a profile by name; None gives DEFAULT_PROFILE."""
+    name = name or DEFAULT_PROFILE
+    if name not in ANALYSIS_PROFILES:
+        raise ValueError(f"Unknown analysis profile '{name}', expected one of {sorted(ANALYSIS_PROFILES)}")
+    return ANALYSIS_PROFILES[name]
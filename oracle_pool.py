@@ -0,0 +1,66 @@
+import oracledb
+
+
+def make_dsn(credentials):
+    """host[:port]/service_name from the [api_credentials] secrets."""
+    host = credentials['host']
+    if credentials.get('port'):
+        host = f"{host}:{credentials['port']}"
+    return f"{host}/{credentials['sn']}"
+
+
+def create_pool(user, password, dsn, min_sessions=1, max_sessions=4, increment=1, ping_interval=60):
+    """
+    Create a python-oracledb connection pool in thin mode (no Instant Client needed).
+
+    Args:
+        user (str): Database user.
+        password (str): Password.
+        dsn (str): host[:port]/service_name.
+        min_sessions (int): Sessions opened up front and kept open.
+        max_sessions (int): Upper bound on concurrent sessions.
+        increment (int): Sessions opened at a time when the pool grows.
+        ping_interval (int): Seconds a session may sit idle before acquire() pings it
+                             and replaces it if it is dead.
+
+    Returns:
+        oracledb.ConnectionPool: Use pool.acquire(); closing the connection returns it to the pool.
+    """
+    return oracledb.create_pool(
+        user=user,
+        password=password,
+        dsn=dsn,
+        min=min_sessions,
+        max=max_sessions,
+        increment=increment,
+        ping_interval=ping_interval,
+        getmode=oracledb.POOL_GETMODE_WAIT,
+    )
+
+
+def check_pool_health(pool):
+    """
+    Round trip to the database through the pool.
+
+    Returns:
+        tuple: (ok, message)
+    """
+    try:
+        with pool.acquire() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM dual")
+                cursor.fetchone()
+        return True, f"{pool.busy}/{pool.opened} sessions busy (max {pool.max})"
+    except oracledb.Error as e:
+        return False, str(e)
+
+
+def create_pool_from_credentials(credentials):
+    """Pool for the [api_credentials] secrets; optional pool_min / pool_max size it."""
+    return create_pool(
+        credentials['user'],
+        credentials['pass'],
+        make_dsn(credentials),
+        min_sessions=int(credentials.get('pool_min', 1)),
+        max_sessions=int(credentials.get('pool_max', 4)),
+    )
@@ -0,0 +1,62 @@
+import numpy as np
+from PIL import Image
+
+# Shared by app.py and streamlit_liver.py so both feed the model identical inputs
+IMG_WIDTH = 224
+IMG_HEIGHT = 224
+IMG_SIZE = (IMG_WIDTH, IMG_HEIGHT)
+
+_SCALE = np.float32(1.0 / 255.0)
+
+# What a corrupt, truncated or non-image upload raises while being decoded
+# (UnidentifiedImageError is an OSError)
+IMAGE_DECODE_ERRORS = (OSError, ValueError, Image.DecompressionBombError)
+
+
+def load_image(image_source):
+    """
+    Open an image from a path, file-like object or PIL image and return it as RGB.
+    JPEGs are decoded in draft mode, letting libjpeg downscale by 1/2..1/8 during
+    decoding while staying at least as large as the model input.
+    """
+    if isinstance(image_source, Image.Image):
+        img = image_source
+    else:
+        img = Image.open(image_source)
+        if img.format == 'JPEG':
+            img.draft('RGB', IMG_SIZE)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return img
+
+
+def preprocess_into(image_source, out):
+    """
+    Resize one image and write it, normalized to [0, 1], into `out`.
+
+    Args:
+        image_source: Path, file-like object or PIL image.
+        out (np.ndarray): float32 buffer of shape (IMG_HEIGHT, IMG_WIDTH, 3).
+    """
+    img = load_image(image_source).resize(IMG_SIZE)
+    # uint8 -> float32 scaling straight into the destination buffer
+    np.multiply(np.asarray(img, dtype=np.uint8), _SCALE, out=out)
+    return out
+
+
+def preprocess_batch(image_sources, out=None):
+    """
+    Preprocess several images into one stacked (N, IMG_HEIGHT, IMG_WIDTH, 3) float32 array.
+    A preallocated `out` buffer of at least N rows may be passed in and is reused.
+    """
+    count = len(image_sources)
+    if out is None:
+        out = np.empty((count, IMG_HEIGHT, IMG_WIDTH, 3), dtype=np.float32)
+    for i, image_source in enumerate(image_sources):
+        preprocess_into(image_source, out[i])
+    return out[:count]
+
+
+def preprocess_image(image_source):
+    """Preprocess a single image into a (1, IMG_HEIGHT, IMG_WIDTH, 3) float32 array."""
+    return preprocess_batch([image_source])
@@ -1,17 +1,21 @@
 import os
 os.environ["CUDA_VISIBLE_DEVICES"] = "-1"  # Force TensorFlow to run on CPU
 
+import io
 import streamlit as st
 import numpy as np
-import tensorflow as tf
-from PIL import Image
-from tensorflow.keras.preprocessing.image import img_to_array
+
+from inference_backends import load_backend, resolve_model_path
+from prediction_cache import PredictionCache, make_cache_key, model_fingerprint
+from preprocessing import preprocess_image
 
 # ==========================
 # CONFIGURATION
 # ==========================
-IMG_SIZE = (224, 224)
 CLASS_ORDER = ['F0', 'F1', 'F2', 'F3', 'F4']
+MODEL_PATH = "Dense_model_.h5"
+# 'keras', 'tflite' or 'onnxruntime'; the lighter backends load Dense_model_.tflite / .onnx
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "keras")
 
 # ==========================
 # CUSTOM CSS
@@ -95,25 +99,44 @@ def inject_custom_css():
 # ==========================
 @st.cache_resource
 def load_model():
-    return tf.keras.models.load_model("Dense_model_.h5")
-# ==========================
-# PREPROCESS IMAGE
-# ==========================
-def preprocess_image(image: Image.Image) -> np.ndarray:
-    image = image.resize(IMG_SIZE)
-    image_array = img_to_array(image) / 255.0  # Normalize to [0,1]
-    return np.expand_dims(image_array, axis=0)
+    return load_backend(INFERENCE_BACKEND, MODEL_PATH)
 
+# Shared across sessions and reruns; counters are available via .stats()
+@st.cache_resource
+def get_prediction_cache():
+    return PredictionCache(max_entries=256, ttl_seconds=3600)
 # ==========================
 # PREDICT FIBROSIS
 # ==========================
-def predict_fibrosis(model, img_tensor, class_labels):
-    prediction = model.predict(img_tensor)
+def predict_fibrosis(model, image_bytes, class_labels):
+    # A cache hit skips decoding, preprocessing and the forward pass
+    prediction_cache = get_prediction_cache()
+    model_id = INFERENCE_BACKEND + ":" + model_fingerprint(resolve_model_path(MODEL_PATH, INFERENCE_BACKEND))
+    cache_key = make_cache_key(image_bytes, model_id)
+    prediction = prediction_cache.get(cache_key)
+    if prediction is None:
+        prediction = model.predict(preprocess_image(io.BytesIO(image_bytes)))
+        prediction_cache.put(cache_key, prediction)
     predicted_class = np.argmax(prediction)
     predicted_label = class_labels[predicted_class]
     fibrosis_status = "No Fibrosis" if predicted_label == "F0" else "Fibrosis Detected"
     return fibrosis_status, predicted_label, prediction
 
+# ==========================
+# RERUN-SAFE INFERENCE
+# ==========================
+def analyze_upload(uploaded_file):
+    # Streamlit reruns the whole script on every widget interaction; keep the
+    # result for the current upload in session state so decode -> preprocess
+    # -> predict runs once per upload and reruns only render
+    memo = st.session_state.get("fibrosis_result")
+    if memo is not None and memo[0] == uploaded_file.file_id:
+        return memo[1]
+
+    result = predict_fibrosis(load_model(), uploaded_file.getvalue(), CLASS_ORDER)
+    st.session_state.fibrosis_result = (uploaded_file.file_id, result)
+    return result
+
 # ==========================
 # WEBSITE LAYOUT
 # ==========================
@@ -168,12 +191,9 @@ def main():
         uploaded_file = st.file_uploader("📤 Upload an image...", type=["jpg", "jpeg", "png"])
         
         if uploaded_file:
-            image = Image.open(uploaded_file).convert("RGB")
-            st.image(image, caption='🖼️ Uploaded Image', use_column_width=True)
+            st.image(uploaded_file.getvalue(), caption='🖼️ Uploaded Image', use_column_width=True)
             
-            model = load_model()
-            img_tensor = preprocess_image(image)
-            fibrosis_status, predicted_stage, preds = predict_fibrosis(model, img_tensor, CLASS_ORDER)
+            fibrosis_status, predicted_stage, preds = analyze_upload(uploaded_file)
             confidence = float(np.max(preds)) * 100
             
             stage_color = {
@@ -9,11 +9,16 @@ except Exception as e:
     st.exception(e)
     st.stop()
 
-# Force thin mode (important for Streamlit Cloud)
-try:
-    oracledb.init_oracle_client(lib_dir=None)
-except Exception as e:
-    st.info("Thin mode already active or no client needed.")
+from oracle_pool import check_pool_health, create_pool
+
+# Pools are created in thin mode (important for Streamlit Cloud, no Instant Client)
+st.info(f"Thin mode: {oracledb.is_thin_mode()}")
+
+
+# Reuse the pool across reruns for the same connection details
+@st.cache_resource
+def get_test_pool(user, password, dsn):
+    return create_pool(user, password, dsn, min_sessions=1, max_sessions=2)
 
 # Database connection section
 st.header("🔗 Connect to Oracle Database")
@@ -26,12 +31,16 @@ with st.form("db_form"):
 
     if submitted:
         try:
-            conn = oracledb.connect(user=user, password=password, dsn=dsn)
-            st.success("✅ Connected to Oracle DB!")
+            pool = get_test_pool(user, password, dsn)
+            healthy, status = check_pool_health(pool)
+            if not healthy:
+                raise RuntimeError(status)
+            st.success(f"✅ Connected to Oracle DB! Pool: {status}")
 
-            cursor = conn.cursor()
-            cursor.execute("SELECT 'Hello from Oracle!' FROM dual")
-            result = cursor.fetchone()
+            with pool.acquire() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 'Hello from Oracle!' FROM dual")
+                result = cursor.fetchone()
             st.write("📨 Query Result:", result[0])
 
         except Exception as e:
@@ -0,0 +1,126 @@
+import hashlib
+from types import SimpleNamespace
+
+import pytest
+
+from extracted_id_writer import DUPLICATE_ERROR_CODE, ExtractedIdWriter, FlushReport
+
+
+class FakeCursor:
+    def __init__(self, database):
+        self.database = database
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def executemany(self, sql, rows, batcherrors=False):
+        if self.database.fail_next:
+            self.database.fail_next = False
+            raise ConnectionError("DPY-4011: the database or network closed the connection")
+        self.database.statements.append((sql, [dict(row) for row in rows]))
+
+    def getbatcherrors(self):
+        return [SimpleNamespace(offset=offset, full_code=code, message=f"{code}: failed")
+                for offset, code in self.database.batch_errors]
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def cursor(self):
+        return FakeCursor(self.database)
+
+    def commit(self):
+        self.database.commits += 1
+
+
+class FakePool:
+    """Records what one python-oracledb session would run; `batch_errors` are (offset, code) pairs."""
+
+    def __init__(self, batch_errors=()):
+        self.batch_errors = list(batch_errors)
+        self.fail_next = False  # the next executemany raises, like a lost connection
+        self.statements = []
+        self.commits = 0
+        self.connection = FakeConnection(self)
+
+    def acquire(self):
+        return self.connection
+
+
+class FakeImageStore:
+    def __init__(self):
+        self.stored = []
+        self.discarded = []
+
+    def put(self, img_bytes, mime_type, connection=None):
+        self.stored.append((img_bytes, connection))
+        return hashlib.sha256(img_bytes).hexdigest()
+
+    def discard_unreferenced(self, sha256s, connection):
+        self.discarded.append((list(sha256s), connection))
+
+
+def test_images_are_stored_on_the_flush_session_and_committed_once():
+    pool, image_store = FakePool(), FakeImageStore()
+    writer = ExtractedIdWriter(pool, max_rows=10, max_delay_seconds=float('inf'), image_store=image_store)
+    for name in ('a', 'b'):
+        writer.add({'p_id': name}, key=name, image=(name.encode(), 'image/jpeg'))
+    report = writer.flush()
+
+    assert report.inserted == ['a', 'b']
+    assert image_store.stored == [(b'a', pool.connection), (b'b', pool.connection)]
+    _, rows = pool.statements[0]
+    assert [row['img_sha256'] for row in rows] == [hashlib.sha256(name).hexdigest() for name in (b'a', b'b')]
+    assert pool.commits == 1
+    assert image_store.discarded == []
+
+
+def test_images_of_failed_rows_are_discarded_in_the_same_transaction():
+    pool, image_store = FakePool(batch_errors=[(1, DUPLICATE_ERROR_CODE)]), FakeImageStore()
+    writer = ExtractedIdWriter(pool, max_rows=10, max_delay_seconds=float('inf'), image_store=image_store)
+    for name in ('a', 'b'):
+        writer.add({'p_id': name}, key=name, image=(name.encode(), 'image/jpeg'))
+    writer.flush()
+
+    assert image_store.discarded == [([hashlib.sha256(b'b').hexdigest()], pool.connection)]
+    assert pool.commits == 1
+
+
+def test_flush_reports_duplicates_and_errors_per_row():
+    pool = FakePool(batch_errors=[(1, DUPLICATE_ERROR_CODE), (2, 'ORA-01400')])
+    writer = ExtractedIdWriter(pool, max_rows=10, max_delay_seconds=float('inf'))
+    for key in ('a', 'b', 'c', 'd'):
+        writer.add({'p_id': key}, key=key)
+
+    assert writer.flush() == FlushReport(['a', 'd'], ['b'], [('c', 'ORA-01400: failed')])
+    assert pool.commits == 1
+    assert writer.flush() == FlushReport([], [], [])
+
+
+def test_failed_flush_keeps_the_rows_for_the_next_one():
+    pool = FakePool()
+    reports = []
+    writer = ExtractedIdWriter(pool, max_rows=10, max_delay_seconds=float('inf'), on_flush=reports.append)
+    writer.add({'p_id': 'a'}, key='a')
+    writer.add({'p_id': 'b'}, key='b')
+
+    pool.fail_next = True
+    with pytest.raises(ConnectionError):
+        writer.flush()
+    assert pool.commits == 0 and reports == []
+
+    writer.add({'p_id': 'c'}, key='c')
+    assert writer.flush().inserted == ['a', 'b', 'c']
+    assert [row['p_id'] for row in pool.statements[0][1]] == ['a', 'b', 'c']
+    assert pool.commits == 1
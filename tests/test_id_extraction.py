@@ -0,0 +1,121 @@
+import random
+import re
+
+import pytest
+
+from id_extraction import check_text_type_with_len, classify_line, classify_lines, has_arabic_with_diacritics
+
+
+# The regex/loop classifiers classify_line() replaced, kept verbatim as the reference
+
+def legacy_has_arabic_with_diacritics(text):
+    arabic_diacritics = ['\u064B', '\u064C', '\u064D', '\u064E', '\u064F', '\u0650', '\u0651', '\u0652']
+    has_arabic = False
+    has_diacritics = False
+    for char in text:
+        if '\u0621' <= char <= '\u064A':
+            has_arabic = True
+        if char in arabic_diacritics:
+            has_diacritics = True
+        if has_arabic and has_diacritics:
+            return True
+    return False
+
+
+def legacy_check_text_type_with_len(text):
+    text = text.replace(" ", "")
+    has_arabic_chars = bool(re.search(r'[\u0600-\u06FF\u0750-\u077F]+', text))
+    has_arabic_nums = bool(re.search(r'[\u0660-\u0669]+', text))
+    has_english_nums = bool(re.search(r'[0-9]+', text))
+    has_english_chars = bool(re.search(r'[A-Za-z]+', text))
+
+    if has_arabic_chars and has_arabic_nums:
+        text_type = "ara_mix"
+    elif has_arabic_chars:
+        text_type = "ara"
+    elif has_arabic_nums:
+        text_type = "ara_num"
+    elif has_english_nums and has_english_chars:
+        text_type = "eng_mix"
+    elif has_english_nums:
+        text_type = "eng_num"
+    elif has_english_chars:
+        text_type = "eng"
+    else:
+        text_type = "unknown"
+    return text_type, len(text)
+
+
+# Characters around every boundary of the flag table, plus what OCR of a card produces
+ALPHABET = (
+    'اأإآبتثجحخدذرزسشصضطظعغفقكلمنهويىةءئؤ'  # Arabic letters
+    'ًٌٍَُِّْ'  # diacritics
+    'ؠءيًْٰٓ'  # letter / diacritic range edges
+    '٠١٢٣٤٥٦٧٨٩ٟ٪'  # Arabic-Indic digits and their neighbours
+    '۰۱۲۳۴۵۶۷۸۹'  # Extended Arabic-Indic (Persian) digits
+    '؀ۿ܀ݏݐݠݿހ'  # Arabic block and supplement edges
+    '0123456789AZaz@[`{/:'  # ASCII digits, letters and their neighbours
+    'MNbqxy'
+    '  \t -.,'  # spaces (only ' ' is removed) and punctuation
+    'éß中\U0001F600'
+)
+
+EDGE_CASES = [
+    '',
+    ' ',
+    '   ',
+    'محمد',
+    'م\u064Fح\u064Eم\u0651\u064Eد',  # مُحَمَّد
+    'جمهورية مصر العربية',
+    'بطاقة تحقيق الشخصية',
+    '٢٩٠٠١٠١٠١٢٣٤٥٦',
+    '٢٩٠ ٠١٠ ١٠١ ٢٣٤ ٥٦',
+    'ش ٧ الجمهورية',
+    '29001010123456',
+    'AB1234567',
+    'ABC',
+    '\u0750\u0751',
+    '\u0750\u0661',
+    '\u077F 9',
+    '\u064B',
+    '\u064B\u0627',
+    '\u0627\u0652',
+    '\u0653\u0627',
+    '\u06F1\u06F2\u06F3',
+    '١2٣',
+    '12٣',
+    'a١',
+    '/',
+    '١/٢',
+    ' ١',
+    'é',
+    '\U0001F600 ١',
+]
+
+
+def random_strings(count, seed=12):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 24)))
+
+
+@pytest.mark.parametrize('text', EDGE_CASES)
+def test_classify_line_matches_legacy_on_edge_cases(text):
+    line_class = classify_line(text)
+    assert (line_class.text_type, line_class.length) == legacy_check_text_type_with_len(text)
+    assert line_class.has_diacritics == legacy_has_arabic_with_diacritics(text)
+
+
+def test_classify_line_matches_legacy_on_random_strings():
+    for text in random_strings(20000):
+        line_class = classify_line(text)
+        assert (line_class.text_type, line_class.length) == legacy_check_text_type_with_len(text), text
+        assert line_class.has_diacritics == legacy_has_arabic_with_diacritics(text), text
+
+
+def test_wrappers_and_classify_lines_agree_with_classify_line():
+    texts = EDGE_CASES + list(random_strings(500, seed=3))
+    assert classify_lines(texts) == [classify_line(text) for text in texts]
+    for text in texts:
+        assert check_text_type_with_len(text) == legacy_check_text_type_with_len(text)
+        assert has_arabic_with_diacritics(text) == legacy_has_arabic_with_diacritics(text)
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from id_extraction import extract_id_fields
+from ocr_backends import (FIXTURES_DIR, AzureOcrBackend, OcrBackendError, RecordingOcrBackend, ReplayOcrBackend,
+                          create_ocr_backend, result_from_dict)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CARDS_DIR = os.path.join(ROOT, FIXTURES_DIR)
+CARD_NAMES = sorted(os.path.splitext(name)[0] for name in os.listdir(CARDS_DIR) if name.endswith('.jpg'))
+
+
+def read_card(name):
+    with open(os.path.join(CARDS_DIR, name + '.jpg'), 'rb') as f:
+        image_bytes = f.read()
+    with open(os.path.join(CARDS_DIR, name + '.json'), encoding='utf-8') as f:
+        return image_bytes, result_from_dict(json.load(f))
+
+
+def test_every_committed_fixture_has_its_image():
+    fixtures = sorted(os.path.splitext(name)[0] for name in os.listdir(CARDS_DIR) if name.endswith('.json'))
+    assert CARD_NAMES and CARD_NAMES == fixtures
+
+
+@pytest.mark.parametrize('name', CARD_NAMES)
+def test_replay_finds_committed_fixture_by_image_hash(name):
+    image_bytes, expected = read_card(name)
+    assert ReplayOcrBackend(CARDS_DIR).analyze(image_bytes) == expected
+
+
+def test_replay_of_committed_fixture_extracts_the_card():
+    image_bytes, _ = read_card('card_01')
+    with open(os.path.join(ROOT, 'benchmarks', 'fixtures', 'id_cards_truth.json'), encoding='utf-8') as f:
+        truth = json.load(f)['card_01']
+    record = extract_id_fields(ReplayOcrBackend(CARDS_DIR).analyze(image_bytes))
+    assert {field: getattr(record, field) for field in truth} == truth
+
+
+def test_replay_unknown_image_raises_or_uses_default():
+    with pytest.raises(OcrBackendError):
+        ReplayOcrBackend(CARDS_DIR).analyze(b'not a recorded image')
+    _, expected = read_card('card_02')
+    assert ReplayOcrBackend(CARDS_DIR, default_fixture='card_02.json').analyze(b'not a recorded image') == expected
+
+
+def test_recording_backend_writes_fixtures_that_replay(tmp_path):
+    image_bytes, result = read_card('card_03')
+
+    class LiveBackend:
+        name = 'live'
+
+        def analyze(self, image_bytes):
+            return result
+
+    recorder = RecordingOcrBackend(LiveBackend(), ReplayOcrBackend(str(tmp_path)))
+    assert recorder.analyze(image_bytes) == result
+
+    name = hashlib.sha256(image_bytes).hexdigest()[:16]
+    assert sorted(os.listdir(tmp_path)) == [name + '.jpg', name + '.json']
+    assert ReplayOcrBackend(str(tmp_path)).analyze(image_bytes) == result
+
+
+def test_record_dir_setting_wraps_the_backend(tmp_path):
+    backend = create_ocr_backend({}, {'backend': 'replay', 'fixtures_dir': CARDS_DIR, 'record_dir': str(tmp_path)})
+    assert isinstance(backend, RecordingOcrBackend)
+    assert isinstance(backend.backend, ReplayOcrBackend)
+
+
+def test_azure_cache_hit_does_not_take_a_rate_limit_token():
+    _, result = read_card('card_04')
+    calls = []
+
+    class Client:
+        def begin_analyze_document(self, model_id, image_bytes, **kwargs):
+            calls.append('azure')
+            return SimpleNamespace(result=lambda: result)
+
+    class DictCache:
+        def __init__(self):
+            self.entries = {}
+
+        def get(self, image_bytes, model_id):
+            return self.entries.get((image_bytes, model_id))
+
+        def put(self, image_bytes, model_id, value):
+            self.entries[(image_bytes, model_id)] = value
+
+    class CountingBucket:
+        def acquire(self):
+            calls.append('token')
+
+    backend = AzureOcrBackend(Client(), 'read', DictCache(), CountingBucket())
+    assert backend.analyze(b'card') == result
+    assert backend.analyze(b'card') == result
+    assert calls == ['token', 'azure']
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from upload_archive import UploadArchiver
+
+
+def archived_files(folder):
+    return sorted(os.listdir(folder))
+
+
+def test_archive_writes_the_upload(tmp_path):
+    archiver = UploadArchiver(str(tmp_path))
+    path = archiver.archive('card.jpg', b'image').result(timeout=5)
+    assert os.path.basename(path).endswith('_card.jpg')
+    with open(path, 'rb') as f:
+        assert f.read() == b'image'
+
+
+def test_archive_drops_uploads_past_max_pending(tmp_path):
+    archiver = UploadArchiver(str(tmp_path), max_pending=1)
+    archiver._ensure_executor()
+    archiver._pending.acquire()  # the one slot is taken by an upload still being written
+    assert archiver.archive('card.jpg', b'image') is None
+    assert archiver.dropped == 1
+
+
+def test_retention_keeps_max_files(tmp_path):
+    archiver = UploadArchiver(str(tmp_path), max_files=3, retention_every=1)
+    for i in range(6):
+        archiver.archive(f'card_{i}.jpg', b'image').result(timeout=5)
+    assert len(archived_files(tmp_path)) == 3
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs os.fork")
+def test_archive_after_fork_writes_in_the_child(tmp_path):
+    # Like gunicorn with preload_app: the archiver is created, and used, before the fork
+    archiver = UploadArchiver(str(tmp_path))
+    archiver.archive('parent.jpg', b'parent').result(timeout=5)
+
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            path = archiver.archive('child.jpg', b'child').result(timeout=5)
+            status = 0 if os.path.exists(path) else 1
+        finally:
+            os._exit(status)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    names = archived_files(tmp_path)
+    assert any(name.endswith('_child.jpg') for name in names)
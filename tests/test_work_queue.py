@@ -0,0 +1,107 @@
+import time
+
+import pytest
+
+from work_queue import DurableWorkQueue, TokenBucket
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = DurableWorkQueue(str(tmp_path / 'queue.sqlite'))
+    yield queue
+    queue.close()
+
+
+def test_enqueue_then_lease_returns_the_item(queue):
+    item_id = queue.enqueue('extract', {'card_type': 'list'}, b'image')
+    item = queue.lease()
+    assert (item.id, item.kind, item.meta, item.payload, item.attempts) == (
+        item_id, 'extract', {'card_type': 'list'}, b'image', 1)
+    assert queue.lease() is None
+
+
+def test_dedupe_key_merges_into_a_pending_item_and_refreshes_its_meta(queue):
+    first = queue.enqueue('extract', {'card_type': 'list'}, b'image', dedupe_key='extract:abc')
+    second = queue.enqueue('extract', {'card_type': 'OTM-PROJECT'}, b'image', dedupe_key='extract:abc')
+    assert second == first
+    assert queue.counts() == {'pending': 1}
+    assert queue.lease().meta == {'card_type': 'OTM-PROJECT'}
+
+
+def test_dedupe_key_merges_into_a_leased_item(queue):
+    first = queue.enqueue('extract', {}, b'image', dedupe_key='extract:abc')
+    queue.lease()
+    assert queue.enqueue('extract', {}, b'image', dedupe_key='extract:abc') == first
+    assert queue.counts() == {'leased': 1}
+
+
+@pytest.mark.parametrize('finish', ['complete', 'dead_letter'])
+def test_dedupe_key_of_a_finished_item_allows_a_resubmit(queue, finish):
+    first = queue.enqueue('insert', {}, b'image', dedupe_key='insert:abc')
+    queue.lease()
+    if finish == 'complete':
+        queue.complete(first)
+    else:
+        queue.dead_letter(first, 'ORA-00942: table or view does not exist')
+
+    second = queue.enqueue('insert', {}, b'image', dedupe_key='insert:abc')
+    assert second != first
+    assert queue.lease().id == second
+
+
+def test_expired_lease_is_picked_up_again(tmp_path):
+    queue = DurableWorkQueue(str(tmp_path / 'queue.sqlite'), lease_seconds=0.05)
+    item_id = queue.enqueue('extract', {}, b'image')
+    assert queue.lease().id == item_id
+    assert queue.lease() is None
+    time.sleep(0.1)
+    item = queue.lease()
+    assert (item.id, item.attempts) == (item_id, 2)
+    queue.close()
+
+
+def test_retry_reschedules_with_the_new_meta(queue):
+    item_id = queue.enqueue('extract', {'card_type': 'list'}, b'image')
+    queue.lease()
+    queue.retry(item_id, 'throttled', delay=0.05, meta={'card_type': 'list', 'extracted_info': {}})
+    assert queue.lease() is None
+    assert 0 < queue.next_due_in() <= 0.05
+    time.sleep(0.1)
+    item = queue.lease()
+    assert (item.id, item.attempts, item.last_error) == (item_id, 2, 'throttled')
+    assert item.meta == {'card_type': 'list', 'extracted_info': {}}
+
+
+def test_complete_drops_the_payload(queue):
+    item_id = queue.enqueue('insert', {}, b'image')
+    queue.lease()
+    queue.complete(item_id, meta={'result': 'inserted'})
+    assert queue.counts() == {'done': 1}
+    assert queue.lease() is None
+
+
+def test_dead_letter_and_requeue(queue):
+    item_id = queue.enqueue('extract', {'card_type': 'list'}, b'image')
+    queue.lease()
+    queue.dead_letter(item_id, 'Missing fields after OCR: id')
+    assert queue.lease() is None
+    [entry] = queue.dead_letters()
+    assert (entry['id'], entry['attempts'], entry['error']) == (item_id, 1, 'Missing fields after OCR: id')
+
+    assert queue.requeue(item_id)
+    assert not queue.requeue(item_id)  # no longer dead-lettered
+    item = queue.lease()
+    assert (item.id, item.attempts, item.payload) == (item_id, 1, b'image')
+
+
+def test_token_bucket_spaces_calls_at_its_rate():
+    bucket = TokenBucket(rate=20)
+    assert bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0)
+    assert bucket.acquire(timeout=1)
+
+
+def test_token_bucket_pause_blocks_every_caller():
+    bucket = TokenBucket(rate=1000, capacity=5)
+    bucket.pause(60)
+    assert not bucket.acquire(timeout=0.05)
@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.utils import secure_filename
+
+
+class UploadArchiver:
+    """
+    Write uploaded images to disk off the request thread and keep the folder bounded.
+
+    Args:
+        folder (str): Directory the uploads are archived in.
+        max_files (int): Keep at most this many files (oldest removed first). 0 = no limit.
+        max_age_seconds (float): Remove files older than this. 0 = no limit.
+        max_pending (int): Uploads waiting to be written at most; past this, new
+                           uploads are not archived (counted in `dropped`).
+        retention_every (int): Apply the retention policy every this many writes,
+                               so the folder may briefly hold up to that many extra files.
+    """
+
+    def __init__(self, folder, max_files=1000, max_age_seconds=7 * 24 * 3600, max_pending=64, retention_every=50):
+        self.folder = folder
+        self.max_files = max_files
+        self.max_age_seconds = max_age_seconds
+        self.retention_every = max(1, retention_every)
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._writes = 0
+        self._dropped_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = None
+        self._pid = None
+        os.makedirs(folder, exist_ok=True)
+
+    def _ensure_executor(self):
+        # Threads do not survive a fork, so the writer is started lazily in
+        # whichever process first archives (e.g. each gunicorn worker)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # Bounds the bytes held in memory while the disk is slower than intake
+                self._pending = threading.BoundedSemaphore(self.max_pending)
+                # A single writer thread keeps archival ordered and off the hot path
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="upload-archive")
+                self._executor.submit(self.enforce_retention)
+                self._pid = os.getpid()
+
+    def archive(self, filename, data):
+        """Queue `data` (bytes) to be saved under `filename`; returns a Future, or None if the backlog is full."""
+        self._ensure_executor()
+        if not self._pending.acquire(blocking=False):
+            with self._dropped_lock:
+                self.dropped += 1
+            return None
+        try:
+            return self._executor.submit(self._write, filename, data)
+        except BaseException:
+            self._pending.release()
+            raise
+
+    def _write(self, filename, data):
+        try:
+            # Prefix with a short id so repeated uploads of "image.jpg" don't clobber each other
+            name = f"{uuid.uuid4().hex[:8]}_{secure_filename(filename) or 'upload'}"
+            path = os.path.join(self.folder, name)
+            with open(path, 'wb') as f:
+                f.write(data)
+        finally:
+            self._pending.release()
+        # Scanning the folder is O(files), so it is not done on every write
+        self._writes += 1
+        if self._writes % self.retention_every == 0:
+            self.enforce_retention()
+        return path
+
+    def enforce_retention(self):
+        entries = []
+        for entry in os.scandir(self.folder):
+            if entry.is_file():
+                entries.append((entry.stat().st_mtime, entry.path))
+        entries.sort()
+
+        now = time.time()
+        expired = []
+        if self.max_age_seconds:
+            expired = [path for mtime, path in entries if now - mtime > self.max_age_seconds]
+        kept = len(entries) - len(expired)
+        if self.max_files and kept > self.max_files:
+            expired_set = set(expired)
+            remaining = [path for _, path in entries if path not in expired_set]
+            expired += remaining[:kept - self.max_files]
+
+        for path in expired:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
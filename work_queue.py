@@ -0,0 +1,252 @@
+"""
+Durable local work queue for ID card extractions and inserts that could not be
+completed right away (Azure quota/throttling, Oracle outages).
+
+Items live in a SQLite file, so they survive restarts and can be shared by the
+Streamlit app (which enqueues) and id_queue_worker.py (which drains). A worker
+leases an item, and either completes it, schedules a retry with exponential
+backoff, or moves it to the dead-letter state for a person to look at. Leases
+expire, so an item held by a crashed worker is picked up again.
+
+TokenBucket keeps Azure calls under the pricing tier's rate limit.
+"""
+import json
+import random
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+
+# Analyze requests per second allowed by the Document Intelligence pricing tiers
+AZURE_TIER_RATES = {
+    'F0': 20 / 60,  # 20 calls per minute
+    'S0': 15.0,
+}
+
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_LEASE_SECONDS = 300
+
+
+class WorkItem(NamedTuple):
+    id: int
+    kind: str
+    meta: dict
+    payload: Optional[bytes]
+    attempts: int
+    last_error: Optional[str]
+
+
+def backoff_delay(attempt, base=2.0, cap=600.0):
+    """Exponential backoff with full jitter: uniform in [0, min(cap, base * 2**(attempt - 1))]."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def retry_after_seconds(error):
+    """The Retry-After of an Azure HttpResponseError in seconds, or None."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, bursts of up to `capacity`.
+    pause() stops all callers for a while, e.g. after Azure answered 429.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens):
+        # Returns how long to wait before trying again; 0 if the tokens were taken
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return 0.0
+        return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1, timeout=None):
+        """Block until `tokens` are available. Returns False if `timeout` seconds pass first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                wait = self._reserve(tokens)
+            if wait == 0.0:
+                return True
+            if deadline is not None:
+                if time.monotonic() + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+
+class DurableWorkQueue:
+    """
+    Args:
+        path (str): SQLite database file.
+        lease_seconds (float): How long a leased item is reserved for its worker.
+    """
+
+    def __init__(self, path='.id_queue.sqlite', lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        # Autocommit mode; claims use BEGIN IMMEDIATE so two processes never lease the same item
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS work_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                dedupe_key TEXT UNIQUE,
+                meta TEXT NOT NULL,
+                payload BLOB,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL,
+                lease_until REAL,
+                last_error TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+            """)
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS work_items_ready ON work_items (status, next_attempt)")
+
+    def enqueue(self, kind, meta, payload=None, dedupe_key=None):
+        """
+        Add an item. With `dedupe_key`, enqueueing the same key again (e.g. on a
+        Streamlit rerun) while the first item is still pending or leased only
+        replaces its meta; once it is done or dead a new item is added.
+
+        Returns:
+            int: The item id (the existing one for a duplicate key).
+        """
+        now = time.time()
+        meta = json.dumps(meta, ensure_ascii=False, default=str)
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                if dedupe_key is not None:
+                    # A finished or dead-lettered item with the same key: the card is being resubmitted
+                    self._connection.execute(
+                        """
+                        UPDATE work_items SET dedupe_key = NULL
+                        WHERE dedupe_key = ? AND status NOT IN ('pending', 'leased')
+                        """, (dedupe_key,))
+                self._connection.execute(
+                    """
+                    INSERT INTO work_items (kind, dedupe_key, meta, payload, status, next_attempt, created, updated)
+                    VALUES (?, ?, ?, ?, 'pending', ?, ?, ?)
+                    ON CONFLICT (dedupe_key) DO UPDATE SET meta = excluded.meta, updated = excluded.updated
+                    """, (kind, dedupe_key, meta, payload, now, now, now))
+                if dedupe_key is None:
+                    item_id = self._connection.execute("SELECT last_insert_rowid()").fetchone()[0]
+                else:
+                    item_id = self._connection.execute(
+                        "SELECT id FROM work_items WHERE dedupe_key = ?", (dedupe_key,)).fetchone()[0]
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return item_id
+
+    def lease(self):
+        """Claim the next item that is due (or whose lease expired); None if there is none."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._connection.execute(
+                    """
+                    SELECT id, kind, meta, payload, attempts, last_error FROM work_items
+                    WHERE (status = 'pending' AND next_attempt <= ?) OR (status = 'leased' AND lease_until < ?)
+                    ORDER BY next_attempt LIMIT 1
+                    """, (now, now)).fetchone()
+                if row is not None:
+                    self._connection.execute(
+                        """
+                        UPDATE work_items SET status = 'leased', attempts = attempts + 1, lease_until = ?, updated = ?
+                        WHERE id = ?
+                        """, (now + self.lease_seconds, now, row[0]))
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        item_id, kind, meta, payload, attempts, last_error = row
+        return WorkItem(item_id, kind, json.loads(meta), payload, attempts + 1, last_error)
+
+    def _finish(self, item_id, status, error=None, meta=None, next_attempt=None):
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                """
+                UPDATE work_items SET status = ?, last_error = COALESCE(?, last_error), meta = COALESCE(?, meta),
+                    next_attempt = COALESCE(?, next_attempt), lease_until = NULL, updated = ?,
+                    payload = CASE WHEN ? = 'done' THEN NULL ELSE payload END
+                WHERE id = ?
+                """, (status, error, json.dumps(meta, ensure_ascii=False, default=str) if meta is not None else None,
+                      next_attempt, now, status, item_id))
+
+    def complete(self, item_id, meta=None):
+        """Mark done; the payload (the image) is dropped, the metadata kept for auditing."""
+        self._finish(item_id, 'done', meta=meta)
+
+    def retry(self, item_id, error, delay, meta=None):
+        """Back to pending, due in `delay` seconds. `meta` replaces the stored metadata (progress so far)."""
+        self._finish(item_id, 'pending', error=str(error)[:1000], meta=meta, next_attempt=time.time() + delay)
+
+    def dead_letter(self, item_id, error, meta=None):
+        self._finish(item_id, 'dead', error=str(error)[:1000], meta=meta)
+
+    def requeue(self, item_id):
+        """Move a dead-lettered item back to pending with a fresh attempt count."""
+        now = time.time()
+        with self._lock:
+            cursor = self._connection.execute(
+                "UPDATE work_items SET status = 'pending', attempts = 0, next_attempt = ?, updated = ? "
+                "WHERE id = ? AND status = 'dead'", (now, now, item_id))
+            return cursor.rowcount == 1
+
+    def dead_letters(self, limit=100):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, kind, meta, attempts, last_error, updated FROM work_items WHERE status = 'dead' "
+                "ORDER BY updated DESC LIMIT ?", (limit,)).fetchall()
+        return [{'id': item_id, 'kind': kind, 'meta': json.loads(meta), 'attempts': attempts, 'error': error,
+                 'updated': updated} for item_id, kind, meta, attempts, error, updated in rows]
+
+    def counts(self):
+        with self._lock:
+            return dict(self._connection.execute("SELECT status, COUNT(*) FROM work_items GROUP BY status"))
+
+    def next_due_in(self):
+        """Seconds until the next pending item is due (0 if one is due now), None if nothing is pending."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT MIN(next_attempt) FROM work_items WHERE status = 'pending'").fetchone()
+        if row[0] is None:
+            return None
+        return max(row[0] - time.time(), 0.0)
+
+    def close(self):
+        self._connection.close()